@@ -1,28 +1,55 @@
 from flask import Flask, render_template
-from extensions import db
+from extensions import db, catalog_cache, compression, order_events, metrics, slow_query_log, password_hasher
 from routes import main
+from models import sync_user_directory, add_order_delivery_area, create_missing_indexes, create_table_versions
 from flask_cors import CORS
+from config import Config, engine_options, apply_sqlite_pragmas
+from json_provider import FastJSONProvider
+from commands import register_commands
 import os
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
-    CORS(app) # Enable CORS for all routes
+    CORS(app, expose_headers=['X-Next-Cursor', 'ETag']) # Enable CORS for all routes
     
-    # Database configuration
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'test.db')
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Database configuration (see config.py for the environment variables)
+    app.config.from_object(Config)
+
+    # Overrides used by scripts (e.g. benchmarks pointing at a scratch database)
+    if test_config:
+        app.config.update(test_config)
+
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.json = FastJSONProvider(app)
 
     db.init_app(app)
+    # Registered first so its after_request hook runs last and sees final sizes
+    metrics.init_app(app)
+    catalog_cache.init_app(app)
+    compression.init_app(app)
+    order_events.init_app(app)
+    slow_query_log.init_app(app)
+    password_hasher.init_app(app)
     app.register_blueprint(main)
+    register_commands(app)
 
     with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config)
+        metrics.instrument_engine(db.engine)
+        slow_query_log.instrument_engine(db.engine)
         db.create_all()
+        add_order_delivery_area()
+        create_missing_indexes()
+        sync_user_directory()
+        create_table_versions()
+        # Don't hand startup connections to forked gunicorn workers (preload_app)
+        db.engine.dispose()
 
     # Route to serve the frontend
     @app.route('/')
     def index():
-        return render_template('index.html')
+        # Dashboards stream order changes when events are on and poll otherwise
+        return render_template('index.html', order_updates='stream' if order_events.enabled else 'poll')
 
     return app
 
@@ -0,0 +1,87 @@
+"""
+Order Claim Concurrency Benchmark
+Many courier threads claim the same order at the same instant through
+POST /api/orders/<id>/claim. Every round must have exactly one winner;
+all other couriers must get 409 Conflict.
+
+Usage: python benchmarks/claim_order.py [--couriers 32] [--rounds 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from models import Customer, Courier, Order
+
+def setup(app, couriers, rounds):
+    with app.app_context():
+        db.session.add(Customer(id="bench-customer", name="Bench Customer",
+                                email="bench@customer.com", password="bench"))
+        for i in range(couriers):
+            db.session.add(Courier(id=f"bench-courier-{i}", name=f"Courier {i}",
+                                   email=f"courier{i}@bench.com", password="bench",
+                                   area="Cairo", status="Active"))
+        for r in range(rounds):
+            db.session.add(Order(id=f"bench-order-{r}", customer_id="bench-customer",
+                                 status="pending", delivery_area="Cairo"))
+        db.session.commit()
+
+def run_round(app, order_id, couriers):
+    barrier = threading.Barrier(couriers)
+    statuses = [None] * couriers
+
+    def claim(i):
+        client = app.test_client()
+        barrier.wait()
+        res = client.post(f"/api/orders/{order_id}/claim", json={"courier_id": f"bench-courier-{i}"})
+        statuses[i] = res.status_code
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(couriers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--couriers", type=int, default=32, help="concurrent couriers per order")
+    parser.add_argument("--rounds", type=int, default=20, help="orders to fight over")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db")})
+        setup(app, args.couriers, args.rounds)
+
+        failures = 0
+        started = time.perf_counter()
+        for r in range(args.rounds):
+            order_id = f"bench-order-{r}"
+            statuses = run_round(app, order_id, args.couriers)
+            winners = statuses.count(200)
+            conflicts = statuses.count(409)
+            with app.app_context():
+                assigned = Order.query.get(order_id).courier_id
+            ok = winners == 1 and conflicts == args.couriers - 1 and assigned is not None
+            if not ok:
+                failures += 1
+            print(f"Round {r + 1}: {winners} winner(s), {conflicts} conflict(s), "
+                  f"other={args.couriers - winners - conflicts} -> {'OK' if ok else 'FAIL'}")
+        elapsed = time.perf_counter() - started
+
+        attempts = args.couriers * args.rounds
+        print(f"\n{attempts} claim attempts in {elapsed:.2f}s ({attempts / elapsed:.0f} claims/s)")
+        if failures:
+            print(f"[FAIL] {failures} round(s) did not have exactly one winner")
+            sys.exit(1)
+        print("[PASS] Every order was claimed by exactly one courier")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Database Backend Load Test
+Starts gunicorn (multiple workers, as in production) against a freshly
+seeded scratch database and drives a read/write mix from concurrent
+clients: catalog reads, cart add/remove and order creation. Prints
+throughput, latency and error counts for each database mode so that
+configuration changes can be compared.
+
+Modes:
+  sqlite-legacy  SQLite with a rollback journal and synchronous=FULL
+  sqlite-wal     SQLite with WAL, synchronous=NORMAL and busy_timeout
+  url            the database at --database-url (e.g. PostgreSQL), pooled
+
+Usage: python benchmarks/db_load.py [--modes sqlite-legacy,sqlite-wal]
+                                    [--workers 4] [--clients 16] [--duration 10]
+                                    [--database-url postgresql://...]
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CUSTOMERS = ["customer-2", "customer-3", "customer-4"]
+PRODUCTS = [f"product-{i}" for i in range(1, 10)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def request(base_url, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as res:
+            res.read()
+            return res.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def random_call(rng):
+    customer = rng.choice(CUSTOMERS)
+    roll = rng.random()
+    if roll < 0.6:
+        return "GET", "/api/products?status=approved", None
+    if roll < 0.8:
+        return "POST", f"/api/customers/{customer}/cart/add", {"product_id": rng.choice(PRODUCTS)}
+    if roll < 0.9:
+        return "POST", f"/api/customers/{customer}/cart/remove", {"product_id": rng.choice(PRODUCTS)}
+    return "POST", "/api/orders", {"customer_id": customer, "product_ids": rng.sample(PRODUCTS, 2)}
+
+def drive(base_url, clients, duration):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            method, path, body = random_call(rng)
+            started = time.perf_counter()
+            try:
+                status = request(base_url, method, path, body)
+            except OSError:
+                status = "conn-error"
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, statuses
+
+def wait_for_server(base_url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            request(base_url, "GET", "/api/products?limit=1")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+def run_mode(mode, args, tmp):
+    env = dict(os.environ)
+    if mode == "url":
+        env["DATABASE_URL"] = args.database_url
+    else:
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, f"{mode}.db")
+        if mode == "sqlite-legacy":
+            env.update(SQLITE_JOURNAL_MODE="DELETE", SQLITE_SYNCHRONOUS="FULL")
+        else:
+            env.update(SQLITE_JOURNAL_MODE="WAL", SQLITE_SYNCHRONOUS="NORMAL")
+
+    subprocess.run([sys.executable, "seed_database.py"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env.update(WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{port}", "wsgi:app"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(base_url, server)
+        latencies, statuses = drive(base_url, args.clients, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    latencies.sort()
+    total = len(latencies)
+    pct = lambda p: latencies[min(total - 1, int(total * p))] * 1000 if total else 0.0
+    errors = sum(n for status, n in statuses.items() if status == "conn-error" or status >= 500)
+    print(f"{mode:14} {total / args.duration:8.1f} req/s  p50 {pct(0.50):7.1f} ms  "
+          f"p95 {pct(0.95):7.1f} ms  p99 {pct(0.99):7.1f} ms  errors {errors}  statuses {statuses}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sqlite-legacy,sqlite-wal",
+                        help="comma separated: sqlite-legacy, sqlite-wal, url")
+    parser.add_argument("--database-url", help="database for the 'url' mode")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    if "url" in modes and not args.database_url:
+        parser.error("the 'url' mode needs --database-url")
+
+    print(f"{args.workers} workers x {args.threads} threads, {args.clients} clients, {args.duration:.0f}s per mode\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in modes:
+            run_mode(mode, args, tmp)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""
+API Load Test
+Seeds a scratch database with data_generator at configurable volumes, then drives a weighted
+mix of realistic calls (login, catalog browsing, cart changes, checkout,
+order history and courier feed polling) from concurrent clients, either
+in-process through Flask's test client or against a real gunicorn server.
+Reports requests per second and p50/p95/p99 latency per scenario, and
+writes the results as JSON so runs on different commits can be compared.
+
+Usage: python benchmarks/load_test.py [--targets testclient,gunicorn]
+           [--scale 0.25] [--customers N] [--providers N] [--products N]
+           [--orders N] [--couriers N] [--clients 16] [--duration 15] [--seed 1]
+           [--output results.json] [--compare previous.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app
+import data_generator
+from data_generator import customer_id, courier_id, product_id, customer_email
+from db_load import free_port, wait_for_server
+
+# Scenario weights of the default mix
+MIX = {
+    "browse": 40,
+    "courier_poll": 20,
+    "login": 10,
+    "cart_add": 12,
+    "cart_remove": 5,
+    "order_history": 8,
+    "checkout": 5
+}
+
+def seed(app, args):
+    with app.app_context():
+        data_generator.generate(scale=args.scale, seed=args.seed, progress=lambda message: None,
+                                **args.volumes)
+
+class TestClientTarget:
+    name = "testclient"
+
+    def __init__(self, app):
+        self.app = app
+
+    def call(self, method, path, body=None):
+        res = self.app.test_client().open(path, method=method, json=body)
+        return res.status_code
+
+class HttpTarget:
+    name = "gunicorn"
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def call(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as res:
+                res.read()
+                return res.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+def scenario_call(name, rng, args):
+    volumes = args.volumes
+    customer = customer_id(rng.randrange(volumes["customers"]))
+    if name == "browse":
+        params = rng.choice(["status=approved&limit=50",
+                             f"status=approved&category={rng.choice(list(data_generator.CATEGORIES))}&limit=50",
+                             "status=approved&sort=-price&limit=50",
+                             f"status=approved&q=item%20{rng.randrange(100)}&limit=50"])
+        return "GET", f"/api/products?{params}", None
+    if name == "courier_poll":
+        scope = rng.choice(["available", "mine"])
+        return "GET", f"/api/couriers/{courier_id(rng.randrange(volumes['couriers']))}/orders?scope={scope}", None
+    if name == "login":
+        return "POST", "/api/login", {"email": customer_email(rng.randrange(volumes["customers"])),
+                                      "password": data_generator.PASSWORD}
+    if name == "cart_add":
+        return "POST", f"/api/customers/{customer}/cart/add", {
+            "product_id": product_id(rng.randrange(volumes["products"])), "changes_only": True}
+    if name == "cart_remove":
+        return "POST", f"/api/customers/{customer}/cart/remove", {
+            "product_id": product_id(rng.randrange(volumes["products"])), "changes_only": True}
+    if name == "order_history":
+        return "GET", f"/api/customers/{customer}/orders", None
+    return "POST", f"/api/customers/{customer}/cart/checkout", None
+
+def drive(target, args):
+    names = list(MIX)
+    weights = [MIX[n] for n in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = scenario_call(name, rng, args)
+            started = time.perf_counter()
+            try:
+                status = target.call(method, path, body)
+            except OSError:
+                status = 599
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[name].append(elapsed)
+                # 400 is an expected answer: checking out an empty cart
+                if status >= 500:
+                    errors[name] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(args.seed * 1000 + i,)) for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - started
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies)
+    pct = lambda p: round(latencies[min(total - 1, int(total * p))] * 1000, 2) if total else None
+    return {"requests": total, "errors": errors, "rps": round(total / elapsed, 1),
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+def report(target_name, samples, errors, elapsed):
+    scenarios = {name: summarize(samples[name], errors[name], elapsed) for name in samples}
+    overall = summarize([s for v in samples.values() for s in v], sum(errors.values()), elapsed)
+    print(f"\n{target_name}")
+    print(f"  {'scenario':14} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for name, s in [*scenarios.items(), ("all", overall)]:
+        if s["requests"]:
+            print(f"  {name:14} {s['requests']:8} {s['rps']:8.1f} {s['p50_ms']:8.1f} "
+                  f"{s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['errors']:6}")
+    return {"overall": overall, "scenarios": scenarios}
+
+def run_testclient(args, db_path):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_path})
+    return report("testclient", *drive(TestClientTarget(app), args))
+
+def run_gunicorn(args, db_path):
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + db_path,
+               WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads))
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{port}", "wsgi:app"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(base_url, server)
+        return report(f"gunicorn ({args.workers} workers x {args.threads} threads)",
+                      *drive(HttpTarget(base_url), args))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nCompared with {previous_path} (commit {previous.get('commit')})")
+    for target, result in results["targets"].items():
+        before = previous.get("targets", {}).get(target)
+        if not before:
+            continue
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            old, new = before["overall"][key], result["overall"][key]
+            if old:
+                print(f"  {target:10} {key:7} {old:10.1f} -> {new:10.1f} ({(new - old) / old * 100:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default="testclient,gunicorn", help="comma separated: testclient, gunicorn")
+    parser.add_argument("--scale", type=float, default=0.25, help="data_generator scale factor")
+    for name in data_generator.BASE_VOLUMES:
+        parser.add_argument(f"--{name}", type=int, help=f"{name} to generate (overrides --scale)")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per target")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the data and the request mix")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to print the differences against")
+    args = parser.parse_args()
+    args.volumes = data_generator.volumes_for(args.scale, **{name: getattr(args, name)
+                                                             for name in data_generator.BASE_VOLUMES})
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    runners = {"testclient": run_testclient, "gunicorn": run_gunicorn}
+    unknown = set(targets) - set(runners)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items()
+                   if k not in ("output", "compare") and k not in data_generator.BASE_VOLUMES},
+        "mix": MIX,
+        "targets": {}
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for target in targets:
+            # Every target starts from the same freshly seeded data
+            db_path = os.path.join(tmp, f"{target}.db")
+            started = time.perf_counter()
+            seed(create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + db_path}), args)
+            print(f"seeded {target} database in {time.perf_counter() - started:.1f}s")
+            results["targets"][target] = runners[target](args, db_path)
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results",
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'nocommit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Password Hashing Benchmark
+Times one key derivation at a range of cost settings, then drives
+POST /api/login from concurrent clients under each PASSWORD_HASH_POOL mode
+at the chosen cost. Alongside the logins a single client keeps fetching
+GET /api/products, to show how much hashing slows everything else the
+worker serves.
+
+Usage: python benchmarks/password_hashing.py [--clients 8] [--duration 5]
+           [--workers 2] [--scrypt-n 16384] [--users 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from models import Customer
+from passwords import derive
+
+COSTS = [
+    ("scrypt", (2 ** 12, 8, 1)),
+    ("scrypt", (2 ** 14, 8, 1)),
+    ("scrypt", (2 ** 15, 8, 1)),
+    ("scrypt", (2 ** 16, 8, 1)),
+    ("pbkdf2_sha256", (100000,)),
+    ("pbkdf2_sha256", (600000,))
+]
+POOLS = ["inline", "thread", "process"]
+
+def time_costs(repeat=5):
+    print(f"{'algorithm':14} {'parameters':18} {'ms per hash':>11}")
+    for algorithm, params in COSTS:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            derive(algorithm, params, "correct horse battery staple", b"0123456789abcdef")
+            timings.append(time.perf_counter() - started)
+        print(f"{algorithm:14} {'/'.join(map(str, params)):18} {min(timings) * 1000:11.1f}")
+
+def seed(app, users):
+    with app.app_context():
+        for i in range(users):
+            db.session.add(Customer(id=f"bench-customer-{i}", name=f"Customer {i}",
+                                    email=f"customer{i}@bench.com", password="bench-password"))
+        db.session.commit()
+
+def drive(app, args):
+    deadline = time.perf_counter() + args.duration
+    logins, failures, catalog = [], [], []
+    lock = threading.Lock()
+
+    def login_client(n):
+        client = app.test_client()
+        i = n
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            res = client.post("/api/login", json={"email": f"customer{i % args.users}@bench.com",
+                                                  "password": "bench-password"})
+            with lock:
+                (logins if res.status_code == 200 else failures).append(time.perf_counter() - started)
+            i += args.clients
+
+    def catalog_client():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get("/api/products?limit=20")
+            catalog.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login_client, args=(n,)) for n in range(args.clients)]
+    threads.append(threading.Thread(target=catalog_client))
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return logins, failures, catalog, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent login clients")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per pool mode")
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 14, help="scrypt cost used for the login runs")
+    parser.add_argument("--users", type=int, default=20, help="customers to log in as")
+    args = parser.parse_args()
+
+    time_costs()
+    print(f"\nlogins with scrypt n={args.scrypt_n}, {args.clients} clients, {args.workers} hashing workers")
+    print(f"{'pool':8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'503s':>5} {'catalog p50 ms':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pool in POOLS:
+            app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, f"{pool}.db"),
+                              "PASSWORD_SCRYPT_N": args.scrypt_n, "PASSWORD_HASH_POOL": pool,
+                              "PASSWORD_HASH_WORKERS": args.workers, "PASSWORD_HASH_QUEUE": args.clients})
+            seed(app, args.users)
+            logins, failures, catalog, elapsed = drive(app, args)
+            logins.sort()
+            p95 = logins[int(len(logins) * 0.95)] if logins else 0
+            print(f"{pool:8} {len(logins) / elapsed:9.1f} {statistics.median(logins or [0]) * 1000:8.1f} "
+                  f"{p95 * 1000:8.1f} {len(failures):5} {statistics.median(catalog or [0]) * 1000:15.1f}")
+
+if __name__ == '__main__':
+    main()
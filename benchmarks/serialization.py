@@ -0,0 +1,107 @@
+"""
+Catalog Serialization Benchmark
+Loads a large catalog into a scratch database and times the two halves of
+a listing response separately: building dicts (ORM instances + to_dict()
+versus column rows + PRODUCT_SERIALIZER) and encoding them (the standard
+library versus orjson through FastJSONProvider). Finishes with the full
+GET /api/products?limit=500 path under each encoder.
+
+Usage: python benchmarks/serialization.py [--rows 100000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from json_provider import FastJSONProvider, orjson
+from models import Product, ServiceOfferor
+from serializers import PRODUCT_SERIALIZER
+
+CATEGORIES = ["Pizza", "Burgers", "Drinks", "Desserts", "Salads"]
+
+def seed(app, rows):
+    with app.app_context():
+        db.session.add(ServiceOfferor(id="bench-provider", name="Bench Kitchen",
+                                      email="bench@provider.com", password="bench"))
+        db.session.commit()
+        products = Product.__table__
+        for start in range(0, rows, 10000):
+            db.session.execute(products.insert(), [{
+                "name": f"Product {i}",
+                "details": f"Details of product {i}, with some description text",
+                "price": round(10 + (i % 500) * 0.5, 2),
+                "weight": 0.25 + (i % 8) * 0.25,
+                "category": CATEGORIES[i % len(CATEGORIES)],
+                "status": "approved",
+                "provider_id": "bench-provider"
+            } for i in range(start, min(rows, start + 10000))])
+        db.session.commit()
+
+def best_of(repeat, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def build_orm():
+    return [p.to_dict() for p in Product.query.all()]
+
+def build_rows():
+    return PRODUCT_SERIALIZER.to_dicts(PRODUCT_SERIALIZER.query().all())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="products in the catalog")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    encoders = ["stdlib"] + (["orjson"] if orjson is not None else [])
+    if orjson is None:
+        print("orjson is not installed; only the standard library encoder is measured\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+                          "CATALOG_CACHE_ENABLED": False})
+        started = time.perf_counter()
+        seed(app, args.rows)
+        print(f"seeded {args.rows} products in {time.perf_counter() - started:.1f}s\n")
+
+        with app.app_context():
+            print(f"{'build':6} {'encoder':7} {'build ms':>9} {'encode ms':>10} {'total ms':>9} {'MB':>6}")
+            for build_name, build in (("orm", build_orm), ("rows", build_rows)):
+                build_time, items = best_of(args.repeat, build)
+                for encoder in encoders:
+                    app.config["JSON_ENCODER"] = encoder
+                    provider = FastJSONProvider(app)
+                    encode_time, body = best_of(args.repeat, lambda: provider.dumps_bytes(items))
+                    print(f"{build_name:6} {encoder:7} {build_time * 1000:9.0f} {encode_time * 1000:10.0f} "
+                          f"{(build_time + encode_time) * 1000:9.0f} {len(body) / 1e6:6.1f}")
+
+        print()
+        client = app.test_client()
+        for encoder in encoders:
+            app.config["JSON_ENCODER"] = encoder
+            app.json = FastJSONProvider(app)
+            path = "/api/products?limit=500"
+            started = time.perf_counter()
+            pages = 0
+            while path:
+                res = client.get(path)
+                cursor = res.headers.get("X-Next-Cursor")
+                path = f"/api/products?limit=500&cursor={cursor}" if cursor else None
+                pages += 1
+            elapsed = time.perf_counter() - started
+            print(f"GET /api/products, all {pages} pages of 500 with {encoder}: {elapsed * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
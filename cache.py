@@ -0,0 +1,134 @@
+"""
+Catalog Cache
+Read-through cache for catalog pages and single products. Entries expire
+after a TTL; the in-process backend also evicts least recently used entries
+beyond a size limit.
+
+Every key includes the version of the catalog tables it was loaded from
+(the table_version counters in the database, see models.py), which every
+worker reads before using the cache. A committed write from any worker
+bumps those counters, so all workers stop using older entries at once;
+they are never served again and age out by TTL or eviction.
+
+The default backend lives inside each worker process. Setting
+CATALOG_CACHE_URL to a Redis-protocol server (Redis or a local stand-in
+speaking the same protocol) shares entries between workers; that needs
+the optional `redis` package.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class LRUBackend:
+    """In-process store with per-entry TTL and least-recently-used eviction."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Shared store on a Redis-protocol server; values are stored as JSON."""
+
+    name = 'redis'
+    evictions = 0   # done by the server (maxmemory-policy), not counted here
+
+    def __init__(self, url=None, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, json.dumps(value), ex=ttl or None)
+
+    def clear(self):
+        for key in self.client.scan_iter('catalog:*'):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter('catalog:*'))
+
+class CatalogCache:
+    def __init__(self):
+        self.enabled = False
+        self.ttl = 30
+        self.backend = LRUBackend()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CATALOG_CACHE_ENABLED', True)
+        self.ttl = app.config.get('CATALOG_CACHE_TTL', 30)
+        if app.config.get('CATALOG_CACHE_URL'):
+            self.backend = RedisBackend(app.config['CATALOG_CACHE_URL'])
+        else:
+            self.backend = LRUBackend(app.config.get('CATALOG_CACHE_MAX_ENTRIES', 1024))
+
+    def get_or_load(self, kind, key, version, load):
+        """Return the cached value for (kind, key), calling load() on a miss.
+
+        version is the list of catalog table versions read before load()
+        runs, so a write committed while loading leaves the result under
+        the old, already unused version. None results are not cached.
+        """
+        if not self.enabled:
+            return load()
+        full_key = f"catalog:{'.'.join(map(str, version))}:{kind}:{key}"
+        value = self.backend.get(full_key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = load()
+        if value is not None:
+            self.backend.set(full_key, value, self.ttl)
+        return value
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "entries": len(self.backend)
+        }
@@ -0,0 +1,59 @@
+"""
+Flask CLI Commands
+Maintenance commands, run with `flask --app wsgi <command>`.
+"""
+
+import json
+import time
+import click
+import product_import
+from models import Cart, Order
+
+def register_commands(app):
+    app.cli.add_command(import_products_command)
+    app.cli.add_command(reconcile_carts_command)
+    app.cli.add_command(backfill_order_totals_command)
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(product_import.FORMATS),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--provider-id', help='Provider for rows that do not name one.')
+@click.option('--chunk-size', type=int, default=product_import.DEFAULT_CHUNK_SIZE, show_default=True,
+              help='Rows inserted per transaction.')
+def import_products_command(path, fmt, provider_id, chunk_size):
+    """Bulk import products from a JSON Lines or CSV file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    started = time.perf_counter()
+    with open(path, encoding='utf-8', newline='') as stream:
+        report = product_import.import_products(
+            product_import.read_rows(stream, fmt),
+            default_provider_id=provider_id,
+            chunk_size=max(1, chunk_size)
+        )
+    elapsed = time.perf_counter() - started
+
+    for error in report.errors:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    if report.failed > len(report.errors):
+        click.echo(f"... {report.failed - len(report.errors)} more errors not shown", err=True)
+    click.echo(json.dumps({"inserted": report.inserted, "failed": report.failed,
+                           "seconds": round(elapsed, 2)}))
+
+@click.command('reconcile-carts')
+@click.option('--fix', is_flag=True, help='Correct the stored totals of drifted carts.')
+def reconcile_carts_command(fix):
+    """Check cart running totals against their products (e.g. from cron)."""
+    drift = Cart.find_price_drift(fix=fix)
+    for cart_id, stored, actual in drift:
+        click.echo(f"cart {cart_id}: stored {stored}, actual {actual}")
+    action = "fixed" if fix else "found"
+    click.echo(f"{len(drift)} drifted cart(s) {action}")
+
+@click.command('backfill-order-totals')
+@click.option('--all', 'recompute_all', is_flag=True,
+              help='Recompute every order, not just those missing a price or weight.')
+def backfill_order_totals_command(recompute_all):
+    """Store SQL-computed price and weight totals on existing orders."""
+    updated = Order.backfill_totals(only_missing=not recompute_all)
+    click.echo(f"{updated} order(s) updated")
@@ -0,0 +1,73 @@
+"""
+Response Compression
+Opt-in gzip/deflate (standard library only) for large JSON and text
+responses, negotiated with Accept-Encoding. Bodies of responses that carry
+an ETag are compressed once and kept in an LRU cache keyed by ETag and
+encoding, so a hot catalog page is not recompressed on every request.
+
+The ETag of a compressed response is made weak: the bytes differ from the
+uncompressed representation but the content is the same, and conditional
+GETs compare ETags weakly.
+"""
+
+import gzip
+import zlib
+from flask import request
+from cache import LRUBackend
+
+ENCODINGS = ('gzip', 'deflate')
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/javascript', 'text/')
+
+class Compression:
+    def __init__(self):
+        self.enabled = False
+        self.min_size = 1024
+        self.level = 6
+        self.cache = LRUBackend(0)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', False)
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESSION_LEVEL', 6)
+        self.cache = LRUBackend(app.config.get('COMPRESSION_CACHE_ENTRIES', 64))
+        app.after_request(self.compress_response)
+
+    def compress(self, data, encoding):
+        if encoding == 'gzip':
+            # mtime=0 keeps the output identical for identical bodies
+            return gzip.compress(data, compresslevel=self.level, mtime=0)
+        return zlib.compress(data, self.level)
+
+    def _should_compress(self, response):
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return False
+        if 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        return any(mimetype.startswith(m) for m in COMPRESSIBLE_MIMETYPES)
+
+    def compress_response(self, response):
+        if not self.enabled or not self._should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if not encoding:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        etag, _ = response.get_etag()
+        if etag:
+            key = f"{etag}:{encoding}"
+            body = self.cache.get(key)
+            if body is None:
+                body = self.compress(data, encoding)
+                self.cache.set(key, body)
+            response.set_etag(etag, weak=True)
+        else:
+            body = self.compress(data, encoding)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
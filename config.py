@@ -0,0 +1,129 @@
+"""
+Application Configuration
+Everything deployment specific comes from environment variables so the same
+code runs against the bundled SQLite file locally and a pooled database
+server under gunicorn.
+"""
+
+import os
+from sqlalchemy import event
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+def database_url():
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return 'sqlite:///' + os.path.join(basedir, 'test.db')
+    # Some hosts still hand out the scheme SQLAlchemy dropped in 1.4
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool, per worker process. Keep DB_POOL_SIZE at least as large
+    # as the number of gunicorn threads so requests don't queue for a connection.
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+
+    # SQLite only: WAL lets readers run alongside the single writer, and the
+    # busy timeout makes writers from other workers wait instead of failing
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+
+    # Catalog read-through cache (cache.py). Entries are keyed by the
+    # database's table versions, so no worker serves them after a write;
+    # CATALOG_CACHE_URL shares one copy between workers instead of one each.
+    CATALOG_CACHE_ENABLED = env_bool('CATALOG_CACHE_ENABLED', True)
+    CATALOG_CACHE_TTL = env_int('CATALOG_CACHE_TTL', 30)
+    CATALOG_CACHE_MAX_ENTRIES = env_int('CATALOG_CACHE_MAX_ENTRIES', 1024)
+    CATALOG_CACHE_URL = os.environ.get('CATALOG_CACHE_URL')
+
+    # Opt-in gzip/deflate of JSON and text responses (compression.py)
+    COMPRESSION_ENABLED = env_bool('COMPRESSION_ENABLED', False)
+    COMPRESSION_MIN_SIZE = env_int('COMPRESSION_MIN_SIZE', 1024)
+    COMPRESSION_LEVEL = env_int('COMPRESSION_LEVEL', 6)
+    COMPRESSION_CACHE_ENTRIES = env_int('COMPRESSION_CACHE_ENTRIES', 64)
+
+    # Opt-in order status streams (events.py); dashboards poll without them.
+    # Needs EVENTS_BROKER_URL (Redis, or memory:// for a single worker) and an
+    # async worker, which gunicorn.conf.py picks when EVENTS_ENABLED is set.
+    EVENTS_ENABLED = env_bool('EVENTS_ENABLED', False)
+    EVENTS_BROKER_URL = os.environ.get('EVENTS_BROKER_URL')
+    EVENTS_HEARTBEAT = env_int('EVENTS_HEARTBEAT', 15)
+    EVENTS_STREAM_TIMEOUT = env_int('EVENTS_STREAM_TIMEOUT', 300)
+
+    # Request metrics at /metrics (metrics.py), served to local clients only
+    # unless METRICS_ALLOW_REMOTE is set
+    METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+    METRICS_SERVER_TIMING = env_bool('METRICS_SERVER_TIMING', False)
+    METRICS_ALLOW_REMOTE = env_bool('METRICS_ALLOW_REMOTE', False)
+
+    # Opt-in slow statement recorder with query plans (slow_queries.py)
+    SLOW_QUERY_ENABLED = env_bool('SLOW_QUERY_ENABLED', False)
+    SLOW_QUERY_THRESHOLD_MS = env_int('SLOW_QUERY_THRESHOLD_MS', 100)
+    SLOW_QUERY_LOG_SIZE = env_int('SLOW_QUERY_LOG_SIZE', 200)
+    SLOW_QUERY_EXPLAIN = env_bool('SLOW_QUERY_EXPLAIN', True)
+
+    # Password hashing (passwords.py). Stored hashes keep their own
+    # parameters; raising the cost rehashes each user at their next login.
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    PASSWORD_SCRYPT_N = env_int('PASSWORD_SCRYPT_N', 2 ** 14)
+    PASSWORD_SCRYPT_R = env_int('PASSWORD_SCRYPT_R', 8)
+    PASSWORD_SCRYPT_P = env_int('PASSWORD_SCRYPT_P', 1)
+    PASSWORD_PBKDF2_ITERATIONS = env_int('PASSWORD_PBKDF2_ITERATIONS', 600000)
+    # Hashing runs on a bounded pool: 'thread', 'process' or 'inline'. 'auto'
+    # picks processes on gevent workers (EVENTS_ENABLED), threads otherwise.
+    PASSWORD_HASH_POOL = os.environ.get('PASSWORD_HASH_POOL', 'auto')
+    PASSWORD_HASH_WORKERS = env_int('PASSWORD_HASH_WORKERS', 2)
+    PASSWORD_HASH_QUEUE = env_int('PASSWORD_HASH_QUEUE', 32)
+    PASSWORD_HASH_TIMEOUT = env_int('PASSWORD_HASH_TIMEOUT', 10)
+
+    # 'auto' uses orjson when it is installed (see json_provider.py)
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings."""
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri):
+        # In-memory SQLite uses a single shared connection, not a sized pool
+        return options
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE']
+    )
+    return options
+
+def apply_sqlite_pragmas(engine, config):
+    """Set the SQLite pragmas on every new connection of engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if config['SQLITE_JOURNAL_MODE']:
+            cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        if config['SQLITE_SYNCHRONOUS']:
+            cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.close()
@@ -0,0 +1,269 @@
+"""
+Synthetic Data Generator
+Deterministic, scalable test data: the same seed and scale always produce
+the same rows. Volumes grow linearly with the scale factor (scale 1 is
+about 200k rows, scale 20 about four million) and rows are written with
+chunked executemany inserts, one transaction per chunk, without building
+ORM objects.
+
+Distributions aim to look like production rather than uniform noise:
+areas and categories are weighted, a few providers and products take most
+orders (Pareto popularity), cart and order sizes are geometric, order
+statuses depend on the order's age, and order totals are computed as the
+items are generated.
+
+Used by `python seed_database.py --scale N` and benchmarks/load_test.py.
+"""
+
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from extensions import db, password_hasher
+from ids import make_id
+from models import (Customer, Courier, ServiceOfferor, Product, Cart, Order,
+                    cart_products, order_products, sync_user_directory)
+
+DEFAULT_CHUNK_SIZE = 10000
+PASSWORD = "generated"
+
+# Volumes at scale 1
+BASE_VOLUMES = {
+    "customers": 2000,
+    "providers": 100,
+    "couriers": 100,
+    "products": 20000,
+    "orders": 50000
+}
+CART_SHARE = 0.3    # customers with a non-empty cart
+
+AREAS = {
+    "Cairo": 30, "Giza": 18, "Alexandria": 14, "Nasr City": 10,
+    "Maadi": 8, "Heliopolis": 8, "New Cairo": 7, "6th of October": 5
+}
+# Weight, price range (EGP) and weight range (grams) per category
+CATEGORIES = {
+    "Pizza": (20, 60, 250, 300, 900),
+    "Burgers": (18, 50, 200, 200, 600),
+    "Grocery": (20, 5, 150, 100, 5000),
+    "Drinks": (15, 10, 60, 250, 1500),
+    "Desserts": (10, 25, 120, 100, 500),
+    "Salads": (7, 40, 140, 200, 500),
+    "Pharmacy": (10, 15, 400, 20, 300)
+}
+PRODUCT_STATUSES = {"approved": 90, "pending": 8, "rejected": 2}
+SERVICE_TYPES = {"Restaurant": 60, "Grocery": 25, "Pharmacy": 15}
+# Orders of the last day are still moving; older ones are finished
+RECENT_ORDER_STATUSES = {"pending": 35, "preparing": 30, "on-the-way": 30, "Cancelled": 5}
+OLD_ORDER_STATUSES = {"delivered": 93, "Cancelled": 7}
+
+HISTORY_DAYS = 365
+END_DATE = datetime(2025, 1, 1)
+
+# Generated rows get readable IDs (orders excepted, see below) so that
+# scripts like the load test can address them by index
+def customer_id(i):
+    return f"gen-customer-{i}"
+
+def provider_id(i):
+    return f"gen-provider-{i}"
+
+def courier_id(i):
+    return f"gen-courier-{i}"
+
+def product_id(i):
+    return f"gen-product-{i}"
+
+def customer_email(i):
+    return f"customer{i}@gen.quickdeliver.test"
+
+def volumes_for(scale, **overrides):
+    """Row counts for a scale factor; keyword arguments replace single counts."""
+    volumes = {name: max(1, int(count * scale)) for name, count in BASE_VOLUMES.items()}
+    volumes.update({name: count for name, count in overrides.items() if count is not None})
+    return volumes
+
+def weighted(rng, table):
+    return rng.choices(list(table), list(table.values()))[0]
+
+def geometric(rng, mean, cap):
+    # 1 + geometric number of extra items with the given mean size
+    p = 1 / mean
+    n = 1
+    while n < cap and rng.random() > p:
+        n += 1
+    return n
+
+class GenerationReport:
+    def __init__(self):
+        self.tables = {}
+        self.started = time.perf_counter()
+
+    def add(self, table, rows, seconds):
+        count, total = self.tables.get(table, (0, 0.0))
+        self.tables[table] = (count + rows, total + seconds)
+
+    @property
+    def rows(self):
+        return sum(count for count, _ in self.tables.values())
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def lines(self):
+        for table, (count, seconds) in self.tables.items():
+            yield f"  {table:16} {count:10,} rows {seconds:7.1f}s {count / max(seconds, 1e-9):10,.0f} rows/s"
+        yield f"  {'total':16} {self.rows:10,} rows {self.seconds:7.1f}s {self.rows / self.seconds:10,.0f} rows/s"
+
+def insert_rows(table, rows, report, chunk_size):
+    """executemany rows (any iterable of dicts) into table, committing every chunk."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        started = time.perf_counter()
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        report.add(table.name, len(chunk), time.perf_counter() - started)
+
+def generate(scale=1.0, seed=1, chunk_size=DEFAULT_CHUNK_SIZE, progress=print, **volume_overrides):
+    """Insert a generated data set into the current app's database.
+
+    Must run in an app context on a database that doesn't already hold
+    generated rows. Returns a GenerationReport.
+    """
+    rng = random.Random(seed)
+    volumes = volumes_for(scale, **volume_overrides)
+    report = GenerationReport()
+    areas = list(AREAS)
+    area_weights = list(AREAS.values())
+    # One hash shared by every generated user: hashing each of them would
+    # dominate generation time. Its salt comes from the seed to keep runs identical.
+    password = password_hasher.hash(PASSWORD, salt=random.Random(seed).randbytes(16))
+
+    progress(f"Generating {', '.join(f'{count:,} {name}' for name, count in volumes.items())} (seed {seed})")
+
+    # --- Users ---
+    provider_areas = rng.choices(areas, area_weights, k=volumes["providers"])
+    insert_rows(ServiceOfferor.__table__, ({
+        "id": provider_id(i), "name": f"Provider {i}", "email": f"provider{i}@gen.quickdeliver.test",
+        "password": password, "service_type": weighted(rng, SERVICE_TYPES), "area": provider_areas[i]
+    } for i in range(volumes["providers"])), report, chunk_size)
+
+    customer_areas = rng.choices(areas, area_weights, k=volumes["customers"])
+    customer_addresses = [f"{area}, Street {rng.randint(1, 300)}, Egypt" for area in customer_areas]
+    insert_rows(Customer.__table__, ({
+        "id": customer_id(i), "name": f"Customer {i}", "email": customer_email(i), "password": password,
+        "address": customer_addresses[i],
+        "phone": f"01{rng.randint(0, 2)}{rng.randint(10000000, 99999999)}"
+    } for i in range(volumes["customers"])), report, chunk_size)
+
+    # Every area gets couriers, in proportion to its weight
+    courier_areas = [areas[i % len(areas)] if i < len(areas) else rng.choices(areas, area_weights)[0]
+                     for i in range(volumes["couriers"])]
+    couriers_by_area = {}
+    for i, area in enumerate(courier_areas):
+        couriers_by_area.setdefault(area, []).append(courier_id(i))
+    insert_rows(Courier.__table__, ({
+        "id": courier_id(i), "name": f"Courier {i}", "email": f"courier{i}@gen.quickdeliver.test",
+        "password": password, "status": "Active", "salary": float(rng.randrange(4000, 9000, 250)),
+        "area": courier_areas[i]
+    } for i in range(volumes["couriers"])), report, chunk_size)
+    progress("  users done")
+
+    # --- Products ---
+    # A few providers list most products, and a few products get most orders
+    provider_weights = list(itertools.accumulate(rng.paretovariate(1.2) for _ in range(volumes["providers"])))
+    categories = list(CATEGORIES)
+    category_weights = [spec[0] for spec in CATEGORIES.values()]
+    prices, weights, statuses = [], [], []
+
+    def product_rows():
+        for i in range(volumes["products"]):
+            category = rng.choices(categories, category_weights)[0]
+            _, low, high, min_grams, max_grams = CATEGORIES[category]
+            price = round(rng.uniform(low, high), 2)
+            weight = float(rng.randrange(min_grams, max_grams + 1, 10))
+            status = weighted(rng, PRODUCT_STATUSES)
+            prices.append(price)
+            weights.append(weight)
+            statuses.append(status)
+            yield {
+                "id": product_id(i), "name": f"{category} item {i}",
+                "details": f"Generated {category.lower()} product number {i}",
+                "price": price, "weight": weight, "category": category, "status": status,
+                "provider_id": provider_id(rng.choices(range(volumes["providers"]), cum_weights=provider_weights)[0])
+            }
+    insert_rows(Product.__table__, product_rows(), report, chunk_size)
+
+    orderable = [i for i, status in enumerate(statuses) if status == "approved"] or list(range(volumes["products"]))
+    popularity = list(itertools.accumulate(rng.paretovariate(1.1) for _ in orderable))
+
+    def pick_products(count):
+        picked = set()
+        while len(picked) < min(count, len(orderable)):
+            picked.add(orderable[rng.choices(range(len(orderable)), cum_weights=popularity)[0]])
+        return picked
+    progress("  products done")
+
+    # --- Carts ---
+    cart_items = []
+    def cart_rows():
+        for i in rng.sample(range(volumes["customers"]), int(volumes["customers"] * CART_SHARE)):
+            items = pick_products(geometric(rng, 3, 15))
+            cart = f"gen-cart-{i}"
+            cart_items.extend({"cart_id": cart, "product_id": product_id(p)} for p in items)
+            yield {"id": cart, "customer_id": customer_id(i), "price": round(sum(prices[p] for p in items), 2)}
+    insert_rows(Cart.__table__, cart_rows(), report, chunk_size)
+    insert_rows(cart_products, cart_items, report, chunk_size)
+    progress("  carts done")
+
+    # --- Orders ---
+    # Dates spread over the history window in increasing order, so the
+    # time-ordered IDs built from them sort like the dates
+    start = END_DATE - timedelta(days=HISTORY_DAYS)
+    step_ms = HISTORY_DAYS * 86_400_000 / volumes["orders"]
+    recent = END_DATE - timedelta(days=1)
+    items_buffer = []
+
+    def order_rows():
+        for i in range(volumes["orders"]):
+            ordered_at = start + timedelta(milliseconds=int(i * step_ms + rng.random() * step_ms))
+            customer = rng.randrange(volumes["customers"])
+            area = customer_areas[customer]
+            status = weighted(rng, RECENT_ORDER_STATUSES if ordered_at >= recent else OLD_ORDER_STATUSES)
+            courier = None
+            if status not in ("pending", "Cancelled") and couriers_by_area.get(area):
+                courier = rng.choice(couriers_by_area[area])
+            items = pick_products(geometric(rng, 2.5, 12))
+            # Order dates are naive UTC; the id must not depend on the local timezone
+            order = make_id(int(ordered_at.replace(tzinfo=timezone.utc).timestamp() * 1000), rng.getrandbits(80))
+            items_buffer.extend({"order_id": order, "product_id": product_id(p)} for p in items)
+            yield {
+                "id": order, "order_date": ordered_at, "status": status,
+                "customer_id": customer_id(customer), "courier_id": courier,
+                "delivery_address": customer_addresses[customer], "delivery_area": area,
+                "price": round(sum(prices[p] for p in items), 2),
+                "total_weight": sum(weights[p] for p in items)
+            }
+
+    # Order items are flushed after each chunk of orders, so memory stays
+    # bounded at any scale
+    orders = order_rows()
+    while True:
+        chunk = list(itertools.islice(orders, chunk_size))
+        if not chunk:
+            break
+        insert_rows(Order.__table__, chunk, report, chunk_size)
+        insert_rows(order_products, items_buffer, report, chunk_size)
+        items_buffer.clear()
+    progress("  orders done")
+
+    # Generated users bypass the ORM events that index them for login
+    started = time.perf_counter()
+    sync_user_directory()
+    report.add("user_directory", volumes["customers"] + volumes["providers"] + volumes["couriers"],
+               time.perf_counter() - started)
+    return report
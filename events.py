@@ -0,0 +1,187 @@
+"""
+Order Events
+Publish/subscribe for order changes, streamed to dashboards as Server-Sent
+Events instead of having them poll the order listings.
+
+Channels:
+  customer:<id>   orders of one customer
+  area:<area>     orders delivered to an area (what couriers there can claim)
+  courier:<id>    orders assigned to one courier
+
+Streams are off unless EVENTS_ENABLED is set, and dashboards poll the
+order listings instead. Each open stream holds its connection for up to
+EVENTS_STREAM_TIMEOUT seconds, which only scales on an async worker:
+gunicorn.conf.py switches to gevent when EVENTS_ENABLED is set. Events
+must also reach streams served by other workers, so EVENTS_ENABLED needs
+EVENTS_BROKER_URL pointing at a Redis-protocol server (Redis or a local
+stand-in speaking the same protocol; needs the optional `redis` package).
+EVENTS_BROKER_URL=memory:// keeps events inside the process, which is only
+right for a single worker.
+"""
+
+import json
+import queue
+import threading
+import time
+
+class Subscription:
+    """Events for a set of channels, buffered until the stream reads them."""
+
+    def __init__(self, broker, channels, max_pending):
+        self.broker = broker
+        self.channels = channels
+        self.overflowed = False
+        self._queue = queue.Queue(max_pending)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client must not grow without bound; it is told to resync
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class InProcessBroker:
+    name = 'memory'
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.max_pending)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channels, event):
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._subscribers.get(channel, ()))
+        # A subscriber on several of the channels still gets the event once
+        for subscription in targets:
+            subscription.put(event)
+
+class RedisSubscription:
+    def __init__(self, pubsub, channels):
+        self.channels = channels
+        self.overflowed = False     # the server drops slow subscribers itself
+        self._pubsub = pubsub
+
+    def get(self, timeout):
+        message = self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+    def close(self):
+        self._pubsub.close()
+
+class RedisBroker:
+    name = 'redis'
+
+    def __init__(self, url=None, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def subscribe(self, channels):
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(*[f"events:{channel}" for channel in channels])
+        return RedisSubscription(pubsub, channels)
+
+    def publish(self, channels, event):
+        # One PUBLISH per channel, so a dashboard subscribed to two of them
+        # gets the event twice; harmless, as events carry the whole state
+        data = json.dumps(event)
+        for channel in channels:
+            self.client.publish(f"events:{channel}", data)
+
+class OrderEvents:
+    def __init__(self):
+        self.enabled = False
+        self.broker = InProcessBroker()
+        self.heartbeat = 15
+        self.stream_timeout = 300
+
+    def init_app(self, app):
+        self.enabled = app.config.get('EVENTS_ENABLED', False)
+        self.heartbeat = app.config.get('EVENTS_HEARTBEAT', 15)
+        self.stream_timeout = app.config.get('EVENTS_STREAM_TIMEOUT', 300)
+        broker_url = app.config.get('EVENTS_BROKER_URL')
+        if self.enabled and not broker_url:
+            app.logger.warning("EVENTS_ENABLED needs EVENTS_BROKER_URL (a Redis URL, or memory:// "
+                               "for a single worker); order event streams stay off")
+            self.enabled = False
+        if broker_url and broker_url != 'memory://':
+            self.broker = RedisBroker(broker_url)
+        else:
+            self.broker = InProcessBroker(app.config.get('EVENTS_MAX_PENDING', 100))
+
+    def publish_order(self, order, previous_courier_id=None, **changes):
+        """Announce the current state of order; call after the change is committed.
+
+        changes overrides attributes that were written with a bulk UPDATE and
+        are stale on the instance (e.g. assignedCourier after a claim), and
+        previous_courier_id tells an unassigned courier the order left them.
+        """
+        if not self.enabled:
+            return
+        event = {
+            "id": order.id,
+            "status": order.status,
+            "customerId": order.customer_id,
+            "assignedCourier": order.courier_id,
+            "deliveryArea": order.delivery_area,
+            "totalPrice": order.price
+        }
+        event.update(changes)
+        channels = [f"customer:{event['customerId']}"]
+        if event['deliveryArea']:
+            channels.append(f"area:{event['deliveryArea']}")
+        if event['assignedCourier']:
+            channels.append(f"courier:{event['assignedCourier']}")
+        if previous_courier_id:
+            channels.append(f"courier:{previous_courier_id}")
+        self.broker.publish(channels, event)
+
+    def stream(self, channels):
+        """Yield Server-Sent Events for channels until the client goes away.
+
+        Streams end after stream_timeout seconds; EventSource reconnects on
+        its own, which also lets a worker thread go back to the pool.
+        """
+        subscription = self.broker.subscribe(channels)
+        deadline = time.monotonic() + self.stream_timeout
+        try:
+            yield f"retry: 3000\n: subscribed to {', '.join(channels)}\n\n"
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=self.heartbeat)
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: order\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
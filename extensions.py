@@ -1,3 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
+from cache import CatalogCache
+from compression import Compression
+from events import OrderEvents
+from metrics import Metrics
+from passwords import PasswordHasher
+from slow_queries import SlowQueryLog
 
 db = SQLAlchemy()
+catalog_cache = CatalogCache()
+compression = Compression()
+order_events = OrderEvents()
+metrics = Metrics()
+slow_query_log = SlowQueryLog()
+password_hasher = PasswordHasher()
@@ -0,0 +1,20 @@
+# Gunicorn settings, picked up automatically by `gunicorn wsgi:app` (Procfile).
+# Worker and thread counts come from the environment; size DB_POOL_SIZE
+# (config.py) to at least GUNICORN_THREADS.
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# Each open order event stream (Server-Sent Events) holds its connection for
+# minutes, which would use up a thread per dashboard: streams run on gevent
+events_enabled = os.environ.get('EVENTS_ENABLED', '').lower() in ('1', 'true', 'yes', 'on')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent' if events_enabled else 'gthread')
+if worker_class == 'gevent':
+    # Patch before preload_app imports the app, so its locks and sockets
+    # are gevent's too
+    from gevent import monkey
+    monkey.patch_all()
+
+# Create tables and indexes once in the master process instead of racing
+# each worker through create_app()
+preload_app = True
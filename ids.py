@@ -0,0 +1,46 @@
+"""
+ID Generation
+ULID-style identifiers: 48 bits of millisecond timestamp followed by 80 bits
+of randomness, encoded as 26 Crockford base32 characters. IDs sort in
+creation order as plain strings, so new rows land at the end of primary key
+indexes and "most recent first" is just ORDER BY id DESC.
+"""
+
+import os
+import threading
+import time
+
+ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(ENCODING[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+def make_id(timestamp_ms, random_part):
+    """The ID for a given millisecond timestamp and 80-bit random part."""
+    return _encode(timestamp_ms, 10) + _encode(random_part, 16)
+
+def generate_id():
+    global _last_ms, _last_random
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _last_random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+        else:
+            # Same millisecond (or the clock stepped back): keep IDs from this
+            # process strictly increasing by bumping the random part
+            _last_random += 1
+            if _last_random >> RANDOM_BITS:
+                _last_ms += 1
+                _last_random = 0
+        return make_id(_last_ms, _last_random)
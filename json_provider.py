@@ -0,0 +1,65 @@
+"""
+JSON Provider
+Flask JSON provider that encodes with orjson when it is installed and falls
+back to the standard library otherwise. Output follows Flask's defaults
+(sorted keys, compact unless debugging, HTTP dates for datetimes), so both
+encoders produce the same documents; orjson writes non-ASCII characters as
+UTF-8 instead of \\u escapes.
+
+JSON_ENCODER selects the encoder: 'auto' (orjson if available), 'orjson'
+or 'stdlib'.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ENCODERS = ('auto', 'orjson', 'stdlib')
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        encoder = app.config.get('JSON_ENCODER', 'auto')
+        if encoder not in ENCODERS:
+            raise ValueError(f"JSON_ENCODER must be one of {', '.join(ENCODERS)}, not {encoder!r}")
+        if encoder == 'orjson' and orjson is None:
+            raise RuntimeError("JSON_ENCODER is 'orjson' but the orjson package is not installed")
+        self.use_orjson = orjson is not None and encoder != 'stdlib'
+
+    def _indent(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def _orjson_options(self):
+        # Datetimes go through default() to keep Flask's HTTP date format
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self._indent():
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj):
+        """Encode obj as a response body would be: compact unless debugging."""
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        if self._indent():
+            return super().dumps(obj, indent=2).encode()
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand the encoded bytes straight to the response, without a str round trip
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
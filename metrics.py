@@ -0,0 +1,129 @@
+"""
+Request Metrics
+Per-endpoint latency, SQL statement count and time (from SQLAlchemy engine
+events), and response size histograms, exposed in the Prometheus text
+format at /metrics. With METRICS_SERVER_TIMING the same numbers for each
+request are also sent in a Server-Timing header, so they show up in the
+browser's network panel.
+
+Metrics are kept per worker process; every scrape returns the numbers of
+the worker that served it.
+"""
+
+import bisect
+import ipaddress
+import threading
+import time
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}    # labels -> [count per bucket..., over the last bucket, sum, count]
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+class Metrics:
+    LABELS = ('endpoint', 'method', 'status')
+
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = False
+        self.allow_remote = False
+        self._lock = threading.Lock()
+        self.latency = Histogram('http_request_duration_seconds',
+                                 'Time spent handling the request.', LATENCY_BUCKETS)
+        self.sql_count = Histogram('http_request_sql_statements',
+                                   'SQL statements executed by the request.', SQL_COUNT_BUCKETS)
+        self.sql_time = Histogram('http_request_sql_seconds',
+                                  'Time spent in SQL statements during the request.', LATENCY_BUCKETS)
+        self.size = Histogram('http_response_size_bytes',
+                              'Response body size, when known before streaming.', SIZE_BUCKETS)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.server_timing = app.config.get('METRICS_SERVER_TIMING', False)
+        self.allow_remote = app.config.get('METRICS_ALLOW_REMOTE', False)
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def instrument_engine(self, engine):
+        """Count and time the statements engine runs on behalf of requests."""
+        if not self.enabled:
+            return
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            # A connection runs one statement at a time
+            conn.info['metrics_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context() and 'metrics_started' in g:
+                g.metrics_sql_count += 1
+                g.metrics_sql_time += time.perf_counter() - conn.info['metrics_started']
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+
+    def _finish_request(self, response):
+        if 'metrics_started' not in g or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        labels = (request.endpoint or 'unmatched', request.method, str(response.status_code))
+        size = None if response.is_streamed else response.calculate_content_length()
+        with self._lock:
+            self.latency.observe(labels, elapsed)
+            self.sql_count.observe(labels, g.metrics_sql_count)
+            self.sql_time.observe(labels, g.metrics_sql_time)
+            if size is not None:
+                self.size.observe(labels, size)
+
+        if self.server_timing:
+            response.headers.add('Server-Timing', f"app;dur={elapsed * 1000:.1f}")
+            response.headers.add('Server-Timing', f'db;dur={g.metrics_sql_time * 1000:.1f};'
+                                                  f'desc="{g.metrics_sql_count} queries"')
+        return response
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for histogram in (self.latency, self.sql_count, self.sql_time, self.size):
+                lines.extend(histogram.render(self.LABELS))
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        if not self.allow_remote and not ipaddress.ip_address(request.remote_addr or '127.0.0.1').is_loopback:
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
@@ -1,5 +1,10 @@
-from extensions import db
+from extensions import db, order_events, password_hasher
+from ids import generate_id
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
+import random
 from abc import ABC, ABCMeta, abstractmethod
 
 # Get the actual metaclass from db.Model
@@ -19,12 +24,31 @@ order_products = db.Table('order_products',
     db.Column('product_id', db.String(50), db.ForeignKey('product.id'), primary_key=True)
 )
 
+def insert_ignore(table, **values):
+    """INSERT that silently does nothing when the row's key already exists.
+
+    The result's rowcount tells whether a row was actually inserted.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).values(**values).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).values(**values).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return table.insert().values(**values).prefix_with('IGNORE')
+    # Portable fallback: INSERT ... SELECT ... WHERE NOT EXISTS
+    row = db.select(*[db.literal(v).label(k) for k, v in values.items()])
+    exists = db.exists().where(*[table.c[k] == v for k, v in values.items()])
+    return table.insert().from_select(list(values), row.where(~exists))
+
 # Abstract User Class
 class User(db.Model, ABC, metaclass=CombinedMeta):
     __abstract__ = True
     
     # Private attributes (marked with - in diagram)
-    __id = db.Column('id', db.String(50), primary_key=True)
+    __id = db.Column('id', db.String(50), primary_key=True, default=generate_id)
     __name = db.Column('name', db.String(100), nullable=False)
     __email = db.Column('email', db.String(120), unique=True, nullable=False)
     __password = db.Column('password', db.String(128), nullable=False)
@@ -60,10 +84,17 @@ class User(db.Model, ABC, metaclass=CombinedMeta):
     
     @password.setter
     def password(self, value):
-        self.__password = value
+        # Stored as a salted hash (passwords.py), never as the plain value
+        self.__password = password_hasher.hash(value)
 
     def login(self, password_attempt):
-        return self.__password == password_attempt
+        if not password_hasher.verify(self.__password, password_attempt):
+            return False
+        # Plaintext from before hashing, or a hash made with older parameters
+        if password_hasher.needs_rehash(self.__password):
+            self.password = password_attempt
+            db.session.commit()
+        return True
 
     def sign_up(self):
         db.session.add(self)
@@ -74,6 +105,8 @@ class User(db.Model, ABC, metaclass=CombinedMeta):
         pass
     
 class Customer(User):
+    role = 'customer'
+
     # Private attributes (marked with - in diagram)
     __address = db.Column('address', db.String(200))
     __phone = db.Column('phone', db.String(20))
@@ -125,11 +158,14 @@ class Customer(User):
         return self.get_data()
 
     def create_orders(self, products_list):
-        new_order = Order(id=str(datetime.now().timestamp()), customer_id=self.id)
+        new_order = Order(id=generate_id(), customer_id=self.id,
+                          delivery_address=self.address,
+                          delivery_area=Order.area_from_address(self.address))
         new_order.products.extend(products_list)
-        new_order.calculate_price()
         db.session.add(new_order)
+        new_order.calculate_totals()
         db.session.commit()
+        order_events.publish_order(new_order)
         return new_order
 
     def view_order(self, order_id):
@@ -142,6 +178,8 @@ class Customer(User):
         return self.cart
 
 class Admin(User):
+    role = 'admin'
+
     # Public attributes
     status = db.Column('status', db.String(50))
 
@@ -174,6 +212,8 @@ class Admin(User):
         pass
 
 class Courier(User):
+    role = 'courier'
+
     # Mixed: public and private attributes
     status = db.Column('status', db.String(50))
     __salary = db.Column('salary', db.Float)
@@ -217,15 +257,37 @@ class Courier(User):
     def view_orders(self):
         return Order.query.filter_by(courier_id=self.id).all()
 
+    def orders_feed(self, scope):
+        # 'mine': open orders assigned to this courier
+        # 'available': unassigned open orders in this courier's area
+        # Both filters are served by the composite indexes on Order.
+        query = Order.query.filter(Order.open_status())
+        if scope == 'mine':
+            return query.filter(Order.courier_id == self.id)
+        return query.filter(Order.courier_id.is_(None), Order.delivery_area == self.area)
+
     def edit_area(self, new_area):
         self.area = new_area
         db.session.commit()
 
     def choose_order(self, order):
-        order.courier_id = self.id
+        # Conditional update so that when several couriers claim the same
+        # order at once exactly one of them wins; the rest match no row.
+        orders = Order.__table__
+        result = db.session.execute(orders.update()
+            .where(orders.c.id == order.id,
+                   orders.c.courier_id.is_(None),
+                   Order.open_status())
+            .values(courier_id=self.id))
         db.session.commit()
+        if result.rowcount != 1:
+            return False
+        order_events.publish_order(order, assignedCourier=self.id)
+        return True
 
 class ServiceOfferor(User):
+    role = 'serviceOfferor'
+
     # Public attributes
     service_type = db.Column('service_type', db.String(50))
     area = db.Column('area', db.String(100))
@@ -272,8 +334,95 @@ class ServiceOfferor(User):
             db.session.delete(prod)
             db.session.commit()
 
+# Maps the role names used by the API to the User subclass that stores them
+USER_ROLES = {
+    'customer': Customer,
+    'admin': Admin,
+    'serviceOfferor': ServiceOfferor,
+    'courier': Courier
+}
+
+# Credential index: one row per user of any role, keyed by email, so login
+# resolves the owning table with a single primary key lookup.
+class UserDirectory(db.Model):
+    __tablename__ = 'user_directory'
+
+    email = db.Column(db.String(120), primary_key=True)
+    role = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.String(50), nullable=False, index=True)
+
+    def get_user(self):
+        return USER_ROLES[self.role].query.get(self.user_id)
+
+# Keep the directory in sync with the four User tables
+@event.listens_for(User, 'after_insert', propagate=True)
+def _add_directory_entry(mapper, connection, target):
+    connection.execute(UserDirectory.__table__.insert().values(
+        email=target.email, role=target.role, user_id=target.id))
+
+@event.listens_for(User, 'after_update', propagate=True)
+def _update_directory_entry(mapper, connection, target):
+    if db.inspect(target).attrs._User__email.history.has_changes():
+        directory = UserDirectory.__table__
+        connection.execute(directory.update()
+            .where(directory.c.user_id == target.id, directory.c.role == target.role)
+            .values(email=target.email))
+
+@event.listens_for(User, 'after_delete', propagate=True)
+def _remove_directory_entry(mapper, connection, target):
+    directory = UserDirectory.__table__
+    connection.execute(directory.delete()
+        .where(directory.c.user_id == target.id, directory.c.role == target.role))
+
+def sync_user_directory():
+    # Index users created before the directory table existed. Roles are
+    # visited in the order login used to search them, so the first
+    # table owning an email keeps it.
+    directory = UserDirectory.__table__
+    for role, model in USER_ROLES.items():
+        table = model.__table__
+        missing = db.select(table.c.email, db.literal(role), table.c.id).where(
+            ~db.exists().where(directory.c.email == table.c.email))
+        db.session.execute(directory.insert().from_select(['email', 'role', 'user_id'], missing))
+    db.session.commit()
+
+def create_missing_indexes():
+    # create_all() only builds indexes along with new tables, so indexes
+    # added to an existing model are created here
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+def add_order_delivery_area():
+    # create_all() doesn't add columns to existing tables either: databases
+    # from before the courier feed get delivery_area here, filled in from
+    # the delivery address. Runs before create_missing_indexes(), whose
+    # order indexes cover the column.
+    table = Order.__table__
+    if 'delivery_area' in {c['name'] for c in db.inspect(db.engine).get_columns(table.name)}:
+        return
+    name = db.engine.dialect.identifier_preparer.format_table(table)
+    column_type = table.c.delivery_area.type.compile(db.engine.dialect)
+    with db.engine.begin() as conn:
+        conn.execute(db.text(f"ALTER TABLE {name} ADD COLUMN delivery_area {column_type}"))
+        rows = conn.execute(db.select(table.c.id, table.c.delivery_address)
+                            .where(table.c.delivery_address.is_not(None))).all()
+        if rows:
+            conn.execute(table.update().where(table.c.id == db.bindparam('order_id'))
+                         .values(delivery_area=db.bindparam('area')),
+                         [{"order_id": row.id, "area": Order.area_from_address(row.delivery_address)}
+                          for row in rows])
+
 class Product(db.Model):
-    id = db.Column(db.String(50), primary_key=True)
+    # Composite indexes backing the catalog filters in GET /api/products;
+    # id is the keyset pagination tie-breaker
+    __table_args__ = (
+        db.Index('ix_product_status_category', 'status', 'category', 'id'),
+        db.Index('ix_product_provider_status', 'provider_id', 'status', 'id'),
+        db.Index('ix_product_status_price', 'status', 'price', 'id'),
+    )
+
+    id = db.Column(db.String(50), primary_key=True, default=generate_id)
     name = db.Column(db.String(100), nullable=False)
     details = db.Column(db.Text)
     weight = db.Column(db.Float)
@@ -315,7 +464,7 @@ class Product(db.Model):
 
 class Cart(db.Model):
     # Private attributes (marked with - in diagram)
-    __id = db.Column('id', db.String(50), primary_key=True)
+    __id = db.Column('id', db.String(50), primary_key=True, default=generate_id)
     __price = db.Column('price', db.Float, default=0.0)
     customer_id = db.Column(db.String(50), db.ForeignKey('customer.id'), nullable=False)
     
@@ -336,41 +485,189 @@ class Cart(db.Model):
     def price(self, value):
         self.__price = value
     
-    products = db.relationship('Product', secondary=cart_products, lazy='subquery',
+    # Loaded only when a caller actually reads the items; mutations never need it
+    products = db.relationship('Product', secondary=cart_products, lazy='select',
         backref=db.backref('carts', lazy=True))
 
+    def _lock_row(self):
+        # Every cart mutation locks the cart row before touching its items,
+        # in the same order as checkout(), so concurrent calls queue instead
+        # of deadlocking (SQLite ignores FOR UPDATE; its writers are serialized)
+        carts = Cart.__table__
+        db.session.execute(db.select(carts.c.id).where(carts.c.id == self.id).with_for_update())
+
+    def _insert_item(self, product_id):
+        # INSERT-or-ignore: the (cart_id, product_id) primary key decides
+        # membership, so the cart's items are never loaded or scanned
+        result = db.session.execute(insert_ignore(cart_products, cart_id=self.id, product_id=product_id))
+        return result.rowcount == 1
+
+    def _delete_item(self, product_id):
+        result = db.session.execute(cart_products.delete().where(
+            cart_products.c.cart_id == self.id,
+            cart_products.c.product_id == product_id))
+        return result.rowcount == 1
+
     def add_product(self, product):     #explain
-        if product not in self.products:
-            self.products.append(product)
-            self.calculate_price()
-            db.session.commit()
+        self._lock_row()
+        added = self._insert_item(product.id)
+        if added:
+            self.adjust_price(product.price)
+        db.session.commit()
+        return added
 
     def remove_product(self, product_id):       #explain
-        product = next((p for p in self.products if p.id == product_id), None)
-        if product:
-            self.products.remove(product)
-            self.calculate_price()
-            db.session.commit()
+        self._lock_row()
+        removed = self._delete_item(product_id)
+        if removed:
+            price = db.select(Product.price).where(Product.id == product_id).scalar_subquery()
+            self.adjust_price(-db.func.coalesce(price, 0.0))
+        db.session.commit()
+        return removed
+
+    def apply_changes(self, changes, products):
+        """Apply [(op, product_id), ...] in one transaction.
+
+        products maps product id -> Product for every id being added (and,
+        where known, removed), loaded by the caller in one query. Returns
+        whether each change took effect; the total is adjusted once.
+        """
+        self._lock_row()
+        results = []
+        delta = 0.0
+        for op, product_id in changes:
+            product = products.get(product_id)
+            if op == 'add':
+                applied = self._insert_item(product_id)
+                if applied:
+                    delta += product.price or 0.0
+            else:
+                applied = self._delete_item(product_id)
+                if applied and product:
+                    delta -= product.price or 0.0
+            results.append(applied)
+        if delta:
+            self.adjust_price(delta)
+        db.session.commit()
+        return results
+
+    def adjust_price(self, delta):
+        # Running total: add or subtract the changed item instead of re-summing.
+        # Done as "price = price + delta" in SQL so concurrent changes to the
+        # same cart can't overwrite each other; delta may be a SQL expression.
+        carts = Cart.__table__
+        stmt = carts.update().where(carts.c.id == self.id).values(
+            price=db.func.round(db.func.coalesce(carts.c.price, 0.0) + (delta if delta is not None else 0.0), 2))
+        if db.session.get_bind().dialect.update_returning:
+            new_price = db.session.execute(stmt.returning(carts.c.price)).scalar()
+        else:
+            db.session.execute(stmt)
+            new_price = db.session.query(carts.c.price).filter(carts.c.id == self.id).scalar()
+        set_committed_value(self, '_Cart__price', new_price)
+        return new_price
+
+    def product_ids(self):
+        # Item ids straight from the association table, without loading products
+        return [row[0] for row in db.session.query(cart_products.c.product_id)
+                .filter(cart_products.c.cart_id == self.id)]
 
     def calculate_price(self):      #explain
-        self.price = sum(p.price for p in self.products)
+        # Full recomputation, used to reconcile the running total
+        self.price = round(db.session.query(db.func.coalesce(db.func.sum(Product.price), 0.0))
+            .join(cart_products, cart_products.c.product_id == Product.id)
+            .filter(cart_products.c.cart_id == self.id).scalar(), 2)
         return self.price
 
     def clear_cart(self):
-        self.products = []
+        self._lock_row()
+        db.session.execute(cart_products.delete().where(cart_products.c.cart_id == self.id))
         self.price = 0.0
         db.session.commit()
 
+    @staticmethod
+    def find_price_drift(fix=False, tolerance=0.005):
+        """Compare every cart's running total with the sum of its products.
+
+        Returns (cart_id, stored price, actual price) for carts that drifted,
+        e.g. because a product's price changed while it sat in the cart.
+        With fix=True the stored totals are corrected.
+        """
+        carts = Cart.__table__
+        actual = db.func.coalesce(db.func.sum(Product.price), 0.0)
+        rows = db.session.query(carts.c.id, carts.c.price, actual) \
+            .select_from(carts) \
+            .outerjoin(cart_products, cart_products.c.cart_id == carts.c.id) \
+            .outerjoin(Product, Product.id == cart_products.c.product_id) \
+            .group_by(carts.c.id, carts.c.price) \
+            .having(db.func.abs(db.func.coalesce(carts.c.price, 0.0) - actual) > tolerance) \
+            .all()
+        drift = [(cart_id, price, round(total, 2)) for cart_id, price, total in rows]
+
+        if fix and drift:
+            for cart_id, _, total in drift:
+                db.session.execute(carts.update().where(carts.c.id == cart_id).values(price=total))
+            db.session.commit()
+        return drift
+
     def checkout(self):
-        pass
+        """Turn the cart into an Order in one transaction and empty the cart.
+
+        Items move with a single INSERT ... SELECT from cart_products into
+        order_products, and price and weight are summed in SQL, so no Product
+        is loaded. Returns the new Order, or None if the cart is empty.
+        """
+        carts = Cart.__table__
+        # Zeroing the total first takes the cart's row lock, which concurrent
+        # add/remove calls take (_lock_row) before touching any item: they
+        # can't slip in between reading the items and deleting them
+        db.session.execute(carts.update().where(carts.c.id == self.id).values(price=0.0))
+
+        count, price, weight = db.session.query(
+            db.func.count(),
+            db.func.coalesce(db.func.sum(Product.price), 0.0),
+            db.func.coalesce(db.func.sum(Product.weight), 0.0)
+        ).select_from(cart_products).join(Product, Product.id == cart_products.c.product_id) \
+            .filter(cart_products.c.cart_id == self.id).one()
+        if not count:
+            db.session.rollback()
+            return None
+
+        address = db.session.query(Customer._Customer__address) \
+            .filter(Customer._User__id == self.customer_id).scalar()
+        order = Order(id=generate_id(), customer_id=self.customer_id,
+                      price=round(price, 2), total_weight=weight,
+                      delivery_address=address,
+                      delivery_area=Order.area_from_address(address))
+        db.session.add(order)
+        db.session.flush()
+
+        db.session.execute(order_products.insert().from_select(
+            ['order_id', 'product_id'],
+            db.select(db.literal(order.id), cart_products.c.product_id)
+              .where(cart_products.c.cart_id == self.id)))
+        db.session.execute(cart_products.delete().where(cart_products.c.cart_id == self.id))
+        db.session.commit()
+        order_events.publish_order(order)
+        return order
+
+# Statuses of orders a courier can still pick up or deliver
+OPEN_ORDER_STATUSES = ('pending', 'preparing', 'on-the-way')
 
 class Order(db.Model):
+    # Indexes backing the courier order feed (see Courier.orders_feed)
+    __table_args__ = (
+        db.Index('ix_order_area_courier_status', 'delivery_area', 'courier_id', 'status'),
+        db.Index('ix_order_courier_status', 'courier_id', 'status'),
+        db.Index('ix_order_status', 'status'),
+    )
+
     # Mixed: private and public attributes
-    __id = db.Column('id', db.String(50), primary_key=True)
+    __id = db.Column('id', db.String(50), primary_key=True, default=generate_id)
     order_date = db.Column('order_date', db.DateTime, default=datetime.utcnow)
-    status = db.Column('status', db.String(50))
+    status = db.Column('status', db.String(50), default='pending')
     pickup_address = db.Column('pickup_address', db.String(200))
     delivery_address = db.Column('delivery_address', db.String(200))
+    delivery_area = db.Column('delivery_area', db.String(100))
     total_weight = db.Column('total_weight', db.Float)
     price = db.Column('price', db.Float)
     
@@ -386,9 +683,23 @@ class Order(db.Model):
     def id(self, value):
         self.__id = value
 
-    products = db.relationship('Product', secondary=order_products, lazy='subquery',
+    # Loaded on access only: listings eager-load it explicitly and totals are
+    # stored on the order, so most order lookups never need the products
+    products = db.relationship('Product', secondary=order_products, lazy='select',
         backref=db.backref('orders', lazy=True))
 
+    @staticmethod
+    def area_from_address(address):
+        # Couriers work by city: "Cairo, Egypt" is delivered in "Cairo"
+        if not address:
+            return None
+        return address.split(',')[0].strip()
+
+    @staticmethod
+    def open_status():
+        # Orders placed before statuses were defaulted have none: they are pending
+        return db.or_(Order.status.in_(OPEN_ORDER_STATUSES), Order.status.is_(None))
+
     def create_order(self, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
@@ -396,32 +707,66 @@ class Order(db.Model):
         db.session.commit()
 
     def add_products(self, product):
-        self.products.append(product)
-        self.calculate_price()
+        db.session.execute(insert_ignore(order_products, order_id=self.id, product_id=product.id))
+        self.calculate_totals()
         db.session.commit()
 
     def remove_products(self, product_id):
-        product = next((p for p in self.products if p.id == product_id), None)
-        if product:
-            self.products.remove(product)
-            self.calculate_price()
+        result = db.session.execute(order_products.delete().where(
+            order_products.c.order_id == self.id,
+            order_products.c.product_id == product_id))
+        if result.rowcount:
+            self.calculate_totals()
             db.session.commit()
 
+    @staticmethod
+    def totals_query(order_id):
+        # Price and weight of an order's products as SQL aggregates over order_products
+        return db.select(
+            db.func.round(db.func.coalesce(db.func.sum(Product.price), 0.0), 2),
+            db.func.coalesce(db.func.sum(Product.weight), 0.0)
+        ).select_from(order_products) \
+            .join(Product, Product.id == order_products.c.product_id) \
+            .where(order_products.c.order_id == order_id)
+
+    def calculate_totals(self):
+        # One aggregate query; both totals are stored on the order so readers
+        # (e.g. courier load planning) never have to touch the products
+        self.price, self.total_weight = db.session.execute(Order.totals_query(self.id)).one()
+        return self.price, self.total_weight
+
     def calculate_price(self):
-        self.price = sum(p.price for p in self.products if p.price)
-        return self.price
+        return self.calculate_totals()[0]
     
     def calculate_weight(self):
-        self.total_weight = sum(p.weight for p in self.products if p.weight)
-        return self.total_weight
+        return self.calculate_totals()[1]
+
+    @staticmethod
+    def backfill_totals(only_missing=True):
+        """Recompute stored totals with one correlated UPDATE; returns rows updated."""
+        orders = Order.__table__
+        price, weight = [db.select(column).select_from(order_products)
+            .join(Product, Product.id == order_products.c.product_id)
+            .where(order_products.c.order_id == orders.c.id)
+            .scalar_subquery() for column in (
+                db.func.round(db.func.coalesce(db.func.sum(Product.price), 0.0), 2),
+                db.func.coalesce(db.func.sum(Product.weight), 0.0))]
+        stmt = orders.update().values(price=price, total_weight=weight)
+        if only_missing:
+            stmt = stmt.where(db.or_(orders.c.price.is_(None), orders.c.total_weight.is_(None)))
+        result = db.session.execute(stmt)
+        db.session.commit()
+        return result.rowcount
 
     def update_status(self, new_stats):
         self.status = new_stats
         db.session.commit()
+        order_events.publish_order(self)
 
     def cancel_order(self):
         self.status = "Cancelled"
         db.session.commit()
+        order_events.publish_order(self)
 
     def change_pickup_addr(self, new_addr):
         self.pickup_address = new_addr
@@ -429,4 +774,119 @@ class Order(db.Model):
 
     def change_delivery_addr(self, new_addr):
         self.delivery_address = new_addr
+        self.delivery_area = Order.area_from_address(new_addr)
         db.session.commit()
+
+# --- Change tracking ---
+# Commits bump a counter for each versioned table they wrote, in the same
+# transaction. List endpoints build their ETags from these counters, so a
+# conditional GET is answered by one indexed lookup. Carts are left out:
+# nothing lists them, and they are written far too often to share a counter.
+#
+# Each table's version is the sum of TABLE_VERSION_SHARDS counter rows
+# ("order:0" ... "order:7") and a commit bumps one of them at random, so
+# concurrent writers to a table mostly update different rows instead of
+# queueing for the same row lock.
+TABLE_VERSION_SHARDS = 8
+
+def shard_names(table):
+    return [f"{table}:{shard}" for shard in range(TABLE_VERSION_SHARDS)]
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_version'
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def current(tables):
+        """Return the versions of tables as a list, in the order given."""
+        owners = {name: table for table in tables for name in shard_names(table)}
+        totals = dict.fromkeys(tables, 0)
+        for name, version in (db.session.query(TableVersion.table_name, TableVersion.version)
+                              .filter(TableVersion.table_name.in_(owners))):
+            totals[owners[name]] += version
+        return [totals[table] for table in tables]
+
+VERSIONED_TABLES = ('customer', 'order', 'order_products', 'product', 'service_offeror')
+# Columns the versioned listings return, for tables where most writes touch
+# other columns: a password rehash at login must not expire every order
+# listing. Other tables are versioned on any change.
+VERSIONED_COLUMNS = {
+    'customer': ('name',),      # customerName in GET /api/orders
+    'service_offeror': ('name', 'email', 'service_type', 'area')
+}
+# The cached catalog shows products and their provider's name; its cache
+# keys carry these tables' versions
+CATALOG_TABLES = ('product', 'service_offeror')
+
+def create_table_versions():
+    # Counter rows exist up front, so a bump is always a plain UPDATE. The
+    # first shard starts from the single per-table counter of older
+    # databases, so versions never go back to a number an ETag already used.
+    versions = TableVersion.__table__
+    legacy = dict(db.session.execute(db.select(versions.c.table_name, versions.c.version)
+                                     .where(versions.c.table_name.in_(VERSIONED_TABLES))).all())
+    for table in VERSIONED_TABLES:
+        for shard, name in enumerate(shard_names(table)):
+            db.session.execute(insert_ignore(versions, table_name=name,
+                                             version=legacy.get(table, 0) if shard == 0 else 0))
+    db.session.commit()
+
+def _columns_changed(state, table, columns):
+    mapper = state.mapper
+    return any(state.attrs[mapper.get_property_by_column(table.c[name]).key].history.has_changes()
+               for name in columns)
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+@event.listens_for(Session, 'after_flush')
+def _note_flushed_tables(session, flush_context):
+    changed = _changed_tables(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        state = db.inspect(obj)
+        deleted = obj in session.deleted
+        for table in state.mapper.tables:
+            # A dirty object's own row is only written when a column changed;
+            # backrefs (e.g. Product.orders when an order is placed) mark
+            # objects dirty without touching their table
+            columns = VERSIONED_COLUMNS.get(table.name) or [c.name for c in table.c]
+            if obj in session.dirty and not _columns_changed(state, table, columns):
+                continue
+            changed.add(table.name)
+        for rel in state.mapper.relationships:
+            # Collection changes write the association table, not the object's own
+            if rel.secondary is not None and (deleted or state.attrs[rel.key].history.has_changes()):
+                changed.add(rel.secondary.name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_statement_table(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    statement = orm_execute_state.statement
+    table = getattr(statement, 'table', None)
+    if not orm_execute_state.is_select and table is not None and table.name != TableVersion.__tablename__:
+        _changed_tables(orm_execute_state.session).add(table.name)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_table_versions(session):
+    session.flush()
+    bumped = session.info.get('changed_tables', set()).intersection(VERSIONED_TABLES)
+    if bumped:
+        versions = TableVersion.__table__
+        shard = random.randrange(TABLE_VERSION_SHARDS)
+        names = sorted(shard_names(table)[shard] for table in bumped)
+        result = session.execute(versions.update().where(versions.c.table_name.in_(names))
+                                 .values(version=versions.c.version + 1))
+        if result.rowcount < len(names):
+            # Counter rows go missing when tables are recreated (seeding)
+            for name in names:
+                session.execute(insert_ignore(versions, table_name=name, version=1))
+
+@event.listens_for(Session, 'after_commit')
+def _after_tables_committed(session):
+    session.info.pop('changed_tables', None)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
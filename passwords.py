@@ -0,0 +1,167 @@
+"""
+Password Hashing
+Credentials are stored as self-describing hashes that carry their own
+parameters, so the cost can be raised later without invalidating existing
+passwords:
+
+  scrypt$<n>$<r>$<p>$<salt>$<hash>
+  pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+Anything else in the password column is a plaintext value from before
+hashing; it still logs in once and is replaced by a hash on that login,
+as are hashes made with older parameters.
+
+Key derivation is deliberately slow and CPU bound, so it runs on a bounded
+pool instead of the request thread. With the thread pool the derivation
+itself runs outside the GIL; PASSWORD_HASH_POOL=process moves it to worker
+processes, and 'inline' runs it on the caller. Under gevent, threads are
+green and would run the derivation on the event loop, stalling every
+other connection of the worker, so the default ('auto') uses processes
+there and threads elsewhere, and 'thread' or 'inline' refuse to start. At most
+PASSWORD_HASH_WORKERS derivations run at once and PASSWORD_HASH_QUEUE more
+may wait; further callers wait up to PASSWORD_HASH_TIMEOUT seconds for a
+place and then get PasswordHasherBusy (a 503) instead of piling up work.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+ALGORITHMS = ('scrypt', 'pbkdf2_sha256')
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+def threads_are_green():
+    """True when gevent has monkey-patched threading (gunicorn.conf.py does)."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+class PasswordHasherBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+def b64encode(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+def b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def derive(algorithm, params, password, salt):
+    """Derive the key; a module-level function so process pools can pickle it."""
+    if algorithm == 'scrypt':
+        n, r, p = params
+        # OpenSSL refuses costs above its 32 MB default without a larger limit
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=KEY_BYTES,
+                              maxmem=256 * r * (n + p) + 2 ** 20)
+    (iterations,) = params
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, KEY_BYTES)
+
+def parse(stored):
+    """Split a stored hash into (algorithm, params, salt, key), or None for plaintext."""
+    parts = stored.split('$')
+    expected = {'scrypt': 6, 'pbkdf2_sha256': 4}.get(parts[0])
+    if expected != len(parts):
+        return None
+    try:
+        params = tuple(int(v) for v in parts[1:-2])
+        return parts[0], params, b64decode(parts[-2]), b64decode(parts[-1])
+    except ValueError:
+        return None
+
+class PasswordHasher:
+    def __init__(self):
+        self.algorithm = 'scrypt'
+        self.scrypt_params = (2 ** 14, 8, 1)
+        self.pbkdf2_iterations = 600000
+        self.pool_kind = 'thread'
+        self.workers = 2
+        self.queue = 32
+        self.timeout = 10
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._dummy_hash = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+
+    def init_app(self, app):
+        self.algorithm = app.config.get('PASSWORD_HASH_ALGORITHM', 'scrypt')
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"PASSWORD_HASH_ALGORITHM must be one of {', '.join(ALGORITHMS)}")
+        self.scrypt_params = (app.config.get('PASSWORD_SCRYPT_N', 2 ** 14),
+                              app.config.get('PASSWORD_SCRYPT_R', 8),
+                              app.config.get('PASSWORD_SCRYPT_P', 1))
+        self.pbkdf2_iterations = app.config.get('PASSWORD_PBKDF2_ITERATIONS', 600000)
+        self.pool_kind = app.config.get('PASSWORD_HASH_POOL', 'auto')
+        if self.pool_kind == 'auto':
+            self.pool_kind = 'process' if threads_are_green() else 'thread'
+        elif self.pool_kind != 'process' and threads_are_green():
+            raise ValueError(f"PASSWORD_HASH_POOL={self.pool_kind} would hash on gevent's event loop; "
+                             "use 'process' or 'auto'")
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.queue = app.config.get('PASSWORD_HASH_QUEUE', 32)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self.shutdown()
+        self._dummy_hash = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+
+    @property
+    def params(self):
+        return self.scrypt_params if self.algorithm == 'scrypt' else (self.pbkdf2_iterations,)
+
+    def _executor(self):
+        # Created on first use, i.e. after gunicorn forked the worker
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    pool_class = ProcessPoolExecutor if self.pool_kind == 'process' else ThreadPoolExecutor
+                    self._pool = pool_class(max_workers=self.workers)
+        return self._pool
+
+    def _run(self, *args):
+        if self.pool_kind == 'inline':
+            return derive(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            return self._executor().submit(derive, *args).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def hash(self, password, salt=None):
+        salt = salt or os.urandom(SALT_BYTES)
+        key = self._run(self.algorithm, self.params, password, salt)
+        return '$'.join([self.algorithm, *map(str, self.params), b64encode(salt), b64encode(key)])
+
+    def verify(self, stored, password):
+        """Check password against a stored hash (or legacy plaintext)."""
+        if not isinstance(stored, str) or not isinstance(password, str):
+            return False
+        parsed = parse(stored)
+        if parsed is None:
+            # Legacy plaintext: still take the time of a hash check
+            self.verify_dummy(password)
+            return hmac.compare_digest(stored.encode(), password.encode())
+        algorithm, params, salt, key = parsed
+        return hmac.compare_digest(self._run(algorithm, params, password, salt), key)
+
+    def verify_dummy(self, password):
+        """Spend as long as verify() would, for a login whose email is unknown.
+
+        Otherwise the response time would tell which emails are registered.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash('dummy password')
+        self.verify(self._dummy_hash, password)
+        return False
+
+    def needs_rehash(self, stored):
+        parsed = parse(stored)
+        return parsed is None or parsed[:2] != (self.algorithm, self.params)
@@ -0,0 +1,157 @@
+"""
+Bulk Product Import
+Streams product rows from JSON Lines or CSV, validates them one at a time
+and inserts the valid ones in chunks, one transaction per chunk. Used by
+POST /api/products/bulk and the `flask import-products` command.
+"""
+
+import csv
+import json
+import math
+from extensions import db
+from models import Product, ServiceOfferor
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('jsonl', 'csv')
+
+def read_rows(stream, fmt):
+    """Yield (line number, raw row dict or error message) from a text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, "Expected a JSON object"
+            continue
+        yield line_no, row
+
+def _number(row, field):
+    value = row.get(field)
+    if value is None or value == '':
+        return None
+    # bool is an int subclass, but true is no price
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{field} must be a number")
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a number") from None
+    if not math.isfinite(value):
+        raise ValueError(f"{field} must be a finite number")
+    if value < 0:
+        raise ValueError(f"{field} must not be negative")
+    return value
+
+def _text(row, field, default=None):
+    value = row.get(field)
+    if value is None or value == '':
+        return default
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+def validate_row(row, default_provider_id=None):
+    """Return (values for a Product insert, None) or (None, error message)."""
+    try:
+        name = (_text(row, 'name') or '').strip()
+        if not name:
+            return None, "name is required"
+        provider_id = _text(row, 'provider_id', default_provider_id)
+        if not provider_id:
+            return None, "provider_id is required"
+        price = _number(row, 'price')
+        weight = _number(row, 'weight')
+        details = _text(row, 'details')
+        category = _text(row, 'category')
+        status = _text(row, 'status', 'pending')
+    except ValueError as e:
+        return None, str(e)
+
+    return {
+        'name': name[:100],
+        'details': details,
+        'price': price,
+        'weight': weight,
+        'category': category,
+        'status': status,
+        'provider_id': provider_id
+    }, None
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line_no, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+def _flush_chunk(chunk, report):
+    # Providers are checked once per chunk with a single IN query
+    provider_ids = {values['provider_id'] for _, values in chunk}
+    known = {row[0] for row in db.session.query(ServiceOfferor._User__id)
+             .filter(ServiceOfferor._User__id.in_(provider_ids))}
+
+    rows = []
+    for line_no, values in chunk:
+        if values['provider_id'] in known:
+            rows.append(values)
+        else:
+            report.add_error(line_no, f"Unknown provider_id: {values['provider_id']}")
+    if not rows:
+        return
+
+    try:
+        # executemany: one statement for the whole chunk, ids from the column default
+        db.session.execute(Product.__table__.insert(), rows)
+        db.session.commit()
+        report.inserted += len(rows)
+    except Exception as e:
+        db.session.rollback()
+        for line_no, values in chunk:
+            if values['provider_id'] in known:
+                report.add_error(line_no, f"Chunk rejected by the database: {e.__class__.__name__}")
+
+def import_products(rows, default_provider_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate and insert rows from read_rows(); returns an ImportReport."""
+    report = ImportReport()
+    chunk = []
+    for line_no, row in rows:
+        if isinstance(row, str):
+            report.add_error(line_no, row)
+            continue
+        values, error = validate_row(row, default_provider_id)
+        if error:
+            report.add_error(line_no, error)
+            continue
+        chunk.append((line_no, values))
+        if len(chunk) >= chunk_size:
+            _flush_chunk(chunk, report)
+            chunk = []
+    if chunk:
+        _flush_chunk(chunk, report)
+    # Provider errors are found when a chunk is flushed, after later rows
+    report.errors.sort(key=lambda error: error['line'])
+    return report
@@ -1,12 +1,131 @@
-from flask import Blueprint, jsonify, request
-from extensions import db
-from models import Customer, Admin, Courier, ServiceOfferor, Product, Order, Cart
-import uuid
+from flask import Blueprint, Response, current_app, jsonify, request, abort, make_response, stream_with_context
+from extensions import db, catalog_cache, order_events, slow_query_log, password_hasher
+from models import Customer, Admin, Courier, ServiceOfferor, Product, Order, Cart, UserDirectory, TableVersion, USER_ROLES, CATALOG_TABLES
+from ids import generate_id
+from passwords import PasswordHasherBusy
+from serializers import USER_SERIALIZERS, PRODUCT_SERIALIZER
+import product_import
+import base64
+import hashlib
+import io
+import json
+from urllib.parse import urlencode
+from sqlalchemy.exc import IntegrityError
 
 main = Blueprint('main', __name__)
 
-def generate_id():
-    return str(uuid.uuid4())
+MAX_PAGE_SIZE = 500
+MAX_CART_BATCH = 500
+STREAM_BATCH_SIZE = 500
+
+@main.errorhandler(400)
+def bad_request(error):
+    return jsonify({"error": error.description}), 400
+
+@main.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    # Logins and sign-ups beyond what the hashing pool can queue
+    return jsonify({"error": "Too many logins in progress, try again shortly"}), 503, {"Retry-After": "1"}
+
+# --- Sign-up helpers ---
+# Login resolves an email to a single user through the user directory, so an
+# email can belong to one account only, whatever its role
+def email_taken(email, user_id=None):
+    entry = UserDirectory.query.get(email) if isinstance(email, str) else None
+    return entry is not None and entry.user_id != user_id
+
+def email_taken_response():
+    return jsonify({"error": "An account with this email already exists"}), 409
+
+def sign_up_error(data):
+    # Passwords are hashed as text; anything else used to fail inside the hasher
+    if not isinstance(data.get('password'), str) or not data['password']:
+        return jsonify({"error": "password must be a non-empty string"}), 400
+    if email_taken(data.get('email')):
+        return email_taken_response()
+    return None
+
+def sign_up_response(user, role):
+    try:
+        user.sign_up()
+    except IntegrityError:
+        # Lost a race with a concurrent sign-up for the same email
+        db.session.rollback()
+        return email_taken_response()
+    return jsonify({**user.to_dict(), "role": role}), 201
+
+# --- Keyset pagination helpers ---
+# Cursors are opaque to clients: the (sort value, id) of the last row of a page,
+# so the next page starts with an indexed range scan instead of an OFFSET.
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        abort(400, description="Invalid cursor")
+    return sort_value, row_id
+
+def paginate(query, sort_column, id_column, descending=False):
+    """Apply ?cursor= and ?limit= to a query ordered by (sort_column, id_column).
+
+    Returns the page of rows and the cursor for the next page (or None). Without
+    a limit or cursor the whole result is returned, as the endpoints always did.
+    """
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        if descending:
+            after = db.or_(sort_column < sort_value,
+                           db.and_(sort_column == sort_value, id_column < row_id))
+        else:
+            after = db.or_(sort_column > sort_value,
+                           db.and_(sort_column == sort_value, id_column > row_id))
+        query = query.filter(after)
+        limit = limit or MAX_PAGE_SIZE
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+
+    if not limit:
+        return query.all(), None
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+def paginated_response(result, next_cursor):
+    response = jsonify(result)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# --- Conditional GET ---
+# A listing's ETag hashes the request URL with the change counters of the
+# tables it reads, so an unchanged listing is answered with 304 before its
+# main query runs. build_response gets the same counters, so anything it
+# caches can be keyed by the version the ETag names.
+def conditional_get(tables, build_response):
+    versions = TableVersion.current(tables)
+    etag = hashlib.sha1(json.dumps([request.full_path, versions]).encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(build_response(versions))
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    return response
 
 @main.route('/api/login', methods=['POST'])
 def login():
@@ -14,67 +133,101 @@ def login():
     email = data.get('email')
     password = data.get('password')
     
-    # Check each user type
-    # Note: Using _User__email because the model uses private attributes with properties, 
-    # so filter_by(email=...) fails to find the column.
-    user = Customer.query.filter(Customer._User__email == email).first()
-    role = 'customer'
-    
-    if not user:
-        user = Admin.query.filter(Admin._User__email == email).first()
-        role = 'admin'
-    
-    if not user:
-        user = ServiceOfferor.query.filter(ServiceOfferor._User__email == email).first()
-        role = 'serviceOfferor'
-        
-    if not user:
-        user = Courier.query.filter(Courier._User__email == email).first()
-        role = 'courier'
-        
-    if user:
-        print(f"DEBUG LOGIN: User found: {user.name}")
-        print(f"DEBUG LOGIN: Stored Pwd: {user.password}")
-        print(f"DEBUG LOGIN: Attempt Pwd: {password}")
-        print(f"DEBUG LOGIN: Match?: {user.login(password)}")
+    # One indexed lookup in the user directory tells us which table owns the email
+    entry = UserDirectory.query.get(email) if email and isinstance(email, str) else None
+    user = entry.get_user() if entry else None
 
-    if user and user.login(password):
+    if user is None:
+        # Unknown emails take as long as a wrong password
+        password_hasher.verify_dummy(password)
+    elif user.login(password):
         user_data = user.to_dict()
-        user_data['role'] = role
+        user_data['role'] = entry.role
         return jsonify(user_data)
         
     return jsonify({"error": "Invalid email or password"}), 401
 
+def users_query(role, q=None):
+    # Plain column rows, serialized with USER_SERIALIZERS[role]
+    model = USER_ROLES[role]
+    query = USER_SERIALIZERS[role].query()
+    if q:
+        pattern = f"%{q}%"
+        query = query.filter(db.or_(model._User__name.ilike(pattern), model._User__email.ilike(pattern)))
+    return query.order_by(model._User__id)
+
+def stream_users(roles, q):
+    # Emit one JSON array row by row; yield_per keeps only one batch of
+    # users in memory at a time however many there are
+    dumps = current_app.json.dumps
+    yield '['
+    first = True
+    for role in roles:
+        serializer = USER_SERIALIZERS[role]
+        for row in users_query(role, q).yield_per(STREAM_BATCH_SIZE):
+            u = serializer.to_dict(row)
+            u['role'] = role
+            yield dumps(u) if first else ',' + dumps(u)
+            first = False
+    yield ']'
+
 @main.route('/api/users', methods=['GET'])
 def get_users():
+    # ?role= lists a single role, ?q= matches name or email, ?limit= / ?cursor=
+    # page through users ordered by role then id, and ?stream=1 streams every
+    # matching user without building the whole list in memory
+    role = request.args.get('role')
+    if role and role not in USER_ROLES:
+        return jsonify({"error": f"Unknown role: {role}"}), 400
+    roles = [role] if role else list(USER_ROLES)
+    q = request.args.get('q')
+
+    if request.args.get('stream'):
+        return Response(stream_with_context(stream_users(roles, q)), mimetype='application/json')
+
+    limit = request.args.get('limit', type=int)
+    after_role, after_id = None, None
+    if request.args.get('cursor'):
+        after_role, after_id = decode_cursor(request.args['cursor'])
+        if after_role not in roles:
+            abort(400, description="Invalid cursor")
+        roles = roles[roles.index(after_role):]
+        limit = limit or MAX_PAGE_SIZE
+    if limit:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # Collect users from each table in turn, fetching one row past the page
+    # to know whether another page follows
+    rows = []
+    for r in roles:
+        query = users_query(r, q)
+        if r == after_role:
+            query = query.filter(USER_ROLES[r]._User__id > after_id)
+        if limit:
+            query = query.limit(limit + 1 - len(rows))
+        rows.extend((r, user) for user in query)
+        if limit and len(rows) > limit:
+            break
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last_role, last_user = rows[-1]
+        next_cursor = encode_cursor(last_role, last_user.id)
+
     users = []
-    
-    # Collect all users from all tables
-    for c in Customer.query.all():
-        u = c.to_dict()
-        u['role'] = 'customer'
-        users.append(u)
-        
-    for a in Admin.query.all():
-        u = a.to_dict()
-        u['role'] = 'admin'
+    for r, user in rows:
+        u = USER_SERIALIZERS[r].to_dict(user)
+        u['role'] = r
         users.append(u)
-        
-    for s in ServiceOfferor.query.all():
-        u = s.to_dict()
-        u['role'] = 'serviceOfferor'
-        users.append(u)
-        
-    for cr in Courier.query.all():
-        u = cr.to_dict()
-        u['role'] = 'courier'
-        users.append(u)
-        
-    return jsonify(users)
+
+    return paginated_response(users, next_cursor)
 
 @main.route('/api/users/<id>', methods=['PUT'])
 def update_user_generic(id):
     data = request.get_json()
+    if 'email' in data and email_taken(data['email'], id):
+        return email_taken_response()
     
     # Try to find user in each table
     user = Customer.query.get(id)
@@ -106,6 +259,9 @@ def update_user_generic(id):
 @main.route('/api/customers', methods=['POST'])
 def create_customer():
     data = request.get_json()
+    error = sign_up_error(data)
+    if error:
+        return error
     new_customer = Customer(
         id=generate_id(),
         name=data['name'],
@@ -114,8 +270,7 @@ def create_customer():
         address=data.get('address'),
         phone=str(data.get('phone'))
     )
-    new_customer.sign_up() 
-    return jsonify({**new_customer.to_dict(), "role": "customer"}), 201
+    return sign_up_response(new_customer, "customer")
 
 # Endpoint to get specific customer details
 @main.route('/api/customers/<id>', methods=['GET'])
@@ -149,6 +304,24 @@ def create_product():
     
     return jsonify(new_product.to_dict()), 201
 
+@main.route('/api/products/bulk', methods=['POST'])
+def bulk_create_products():
+    # Body is JSON Lines (one product object per line) or CSV with a header row;
+    # the format comes from ?format= or the Content-Type. ?provider_id= is used
+    # for rows that don't name their provider.
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+    if fmt not in product_import.FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    chunk_size = request.args.get('chunk_size', product_import.DEFAULT_CHUNK_SIZE, type=int)
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    report = product_import.import_products(
+        product_import.read_rows(stream, fmt),
+        default_provider_id=request.args.get('provider_id'),
+        chunk_size=max(1, chunk_size)
+    )
+    return jsonify(report.to_dict())
+
 @main.route('/api/products/<id>', methods=['PUT'])
 def update_product(id):
     product = Product.query.get(id)
@@ -187,27 +360,94 @@ def delete_product(id):
     db.session.commit()
     return jsonify({"message": "Product deleted"})
 
+# Columns the catalog can be sorted by; ties are always broken by id
+PRODUCT_SORT_KEYS = {
+    'id': Product.id,
+    'name': Product.name,
+    'price': Product.price
+}
+
+def catalog_query():
+    # Column-only projection with the provider name joined into the same
+    # statement: no Product entities are built and no per-provider lookups run
+    return PRODUCT_SERIALIZER.query(
+        ServiceOfferor._User__name.label('owner_name')
+    ).outerjoin(ServiceOfferor, ServiceOfferor._User__id == Product.provider_id)
+
+def catalog_item(row):
+    d = PRODUCT_SERIALIZER.to_dict(row)
+    if row.owner_name is not None:
+        d['ownerName'] = row.owner_name
+    return d
+
+def catalog_page(args):
+    query = catalog_query()
+
+    if args.get('status'):
+        query = query.filter(Product.status == args['status'])
+    if args.get('category'):
+        query = query.filter(Product.category == args['category'])
+    if args.get('provider_id'):
+        query = query.filter(Product.provider_id == args['provider_id'])
+
+    min_price = args.get('min_price', type=float)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    max_price = args.get('max_price', type=float)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+
+    if args.get('q'):
+        query = query.filter(Product.name.ilike(f"%{args['q']}%"))
+
+    sort = args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_column = PRODUCT_SORT_KEYS.get(sort.lstrip('-'))
+    if sort_column is None:
+        abort(400, description=f"Unsupported sort key: {sort}")
+    if sort_column is Product.price:
+        # Rows without a price would fall out of the keyset comparison
+        query = query.filter(Product.price.isnot(None))
+
+    rows, next_cursor = paginate(query, sort_column, Product.id, descending)
+    return [catalog_item(row) for row in rows], next_cursor
+
 @main.route('/api/products', methods=['GET'])
 def get_products():
-    # Only return approved products? Or all? Frontend filers them, but typically API should support filtering.
-    # For now returning all, frontend filters.
-    products = Product.query.all()
-    # Enhance product dict with provider name
-    result = []
-    for p in products:
-        d = p.to_dict()
-        d['status'] = p.status
-        d['category'] = p.category
-        d['provider_id'] = p.provider_id
-        if p.provider:
-            d['ownerName'] = p.provider.name
-        result.append(d)
-    return jsonify(result)
+    # Filtering happens in SQL so clients only download the rows they render.
+    # Supported: ?status= &category= &provider_id= &min_price= &max_price= &q=
+    # plus ?sort=name|price|id (prefix with - for descending) and ?limit= &cursor=
+    # Pages are cached under their sorted query string until the catalog changes.
+    def build(versions):
+        key = urlencode(sorted(request.args.items(multi=True)))
+        result, next_cursor = catalog_cache.get_or_load('page', key, versions,
+                                                        lambda: catalog_page(request.args))
+        return paginated_response(result, next_cursor)
+    return conditional_get(CATALOG_TABLES, build)
+
+def load_catalog_item(id):
+    row = catalog_query().filter(Product.id == id).first()
+    return catalog_item(row) if row else None
+
+@main.route('/api/products/<id>', methods=['GET'])
+def get_product(id):
+    item = catalog_cache.get_or_load('product', id, TableVersion.current(CATALOG_TABLES),
+                                     lambda: load_catalog_item(id))
+    if item is None:
+        return jsonify({"error": "Product not found"}), 404
+    return jsonify(item)
+
+@main.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(catalog_cache.stats())
 
 # --- Service Offeror Routes ---
 @main.route('/api/providers', methods=['POST'])
 def create_provider():
     data = request.get_json()
+    error = sign_up_error(data)
+    if error:
+        return error
     new_provider = ServiceOfferor(
         id=generate_id(),
         name=data['name'],
@@ -216,8 +456,7 @@ def create_provider():
         service_type=data.get('service_type'),
         area=data.get('area')
     )
-    new_provider.sign_up()
-    return jsonify({**new_provider.to_dict(), "role": "serviceOfferor"}), 201
+    return sign_up_response(new_provider, "serviceOfferor")
 
 @main.route('/api/providers/<id>', methods=['PUT'])
 def update_provider(id):
@@ -231,13 +470,18 @@ def update_provider(id):
 
 @main.route('/api/providers', methods=['GET'])
 def get_providers():
-    providers = ServiceOfferor.query.all()
-    return jsonify([p.to_dict() for p in providers])
+    def build(versions):
+        serializer = USER_SERIALIZERS['serviceOfferor']
+        return jsonify(serializer.to_dicts(serializer.query().all()))
+    return conditional_get(('service_offeror',), build)
 
 # --- Courier Routes ---
 @main.route('/api/couriers', methods=['POST'])
 def create_courier():
     data = request.get_json()
+    error = sign_up_error(data)
+    if error:
+        return error
     new_courier = Courier(
         id=generate_id(),
         name=data['name'],
@@ -246,8 +490,7 @@ def create_courier():
         area=data.get('area'),
         status="Active"
     )
-    new_courier.sign_up()
-    return jsonify({**new_courier.to_dict(), "role": "courier"}), 201
+    return sign_up_response(new_courier, "courier")
 
 @main.route('/api/couriers/<id>/area', methods=['PUT'])
 def update_courier_area(id):
@@ -261,43 +504,77 @@ def update_courier_area(id):
     return jsonify(courier.to_dict())
 
 # --- Order Routes ---
+# Loading plan shared by the order listings: the customer is joined into the
+# order query and all products come from one IN-batched SELECT, so a listing
+# costs the same number of queries whatever its size.
+# (Order.customer is a backref, so the options are built once mappers are configured.)
+def order_list_loading():
+    return (db.joinedload(Order.customer), db.selectinload(Order.products))
+
+# Tables read by the order listings, for their ETags; GET /api/orders also
+# shows customer names
+ORDER_LIST_TABLES = ('order', 'order_products', 'product')
+
+def order_summary(o):
+    # Construct detailed order object
+    return {
+        "id": o.id,
+        "status": o.status,
+        "totalPrice": o.price,
+        "date": o.order_date.strftime("%Y-%m-%d"),
+        "customerId": o.customer_id,
+        "customerName": o.customer.name if o.customer else "Unknown",
+        "assignedCourier": o.courier_id,
+        "deliveryArea": o.delivery_area,
+        "items": [{"name": p.name, "price": p.price} for p in o.products]
+    }
+
 @main.route('/api/orders', methods=['GET'])
 def get_orders():
-    orders = Order.query.all()
-    result = []
-    for o in orders:
-        # Construct detailed order object
-        order_dict = {
-            "id": o.id,
-            "status": o.status,
-            "totalPrice": o.price,
-            "date": o.order_date.strftime("%Y-%m-%d"),
-            "customerId": o.customer_id,
-            "customerName": o.customer.name if o.customer else "Unknown",
-            "assignedCourier": o.courier_id,
-            "items": [{"name": p.name, "price": p.price} for p in o.products]
-        }
-        result.append(order_dict)
-    return jsonify(result)
+    def build(versions):
+        orders = Order.query.options(*order_list_loading()).all()
+        return jsonify([order_summary(o) for o in orders])
+    return conditional_get(ORDER_LIST_TABLES + ('customer',), build)
+
+@main.route('/api/couriers/<id>/orders', methods=['GET'])
+def get_courier_orders(id):
+    # ?scope=available (default): unassigned open orders in the courier's area
+    # ?scope=mine: open orders assigned to this courier
+    courier = Courier.query.get(id)
+    if not courier:
+        return jsonify({"error": "Courier not found"}), 404
+
+    scope = request.args.get('scope', 'available')
+    if scope not in ('available', 'mine'):
+        return jsonify({"error": f"Unknown scope: {scope}"}), 400
+
+    orders = courier.orders_feed(scope).options(*order_list_loading()).all()
+    return jsonify([order_summary(o) for o in orders])
 
 @main.route('/api/customers/<cid>/orders', methods=['GET'])
 def get_customer_orders(cid):
-    customer = Customer.query.get(cid)
-    if not customer:
-        return jsonify({"error": "Customer not found"}), 404
+    def build(versions):
+        customer = Customer.query.get(cid)
+        if not customer:
+            return jsonify({"error": "Customer not found"}), 404
         
-    result = []
-    for o in customer.orders:
-        order_dict = {
-            "id": o.id,
-            "status": o.status or 'Pending', # Handle None status
-            "total_price": o.price,
-            "payment_method": "Cash", # Placeholder until DB column added
-            "date": o.order_date.strftime("%Y-%m-%d") if o.order_date else "N/A",
-            "items": [{"name": p.name, "price": p.price} for p in o.products]
-        }
-        result.append(order_dict)
-    return jsonify(result)
+        # IDs are time-ordered, so the primary key gives most recent orders first
+        orders = (Order.query.filter_by(customer_id=cid)
+                  .order_by(Order._Order__id.desc())
+                  .options(*order_list_loading()).all())
+        result = []
+        for o in orders:
+            order_dict = {
+                "id": o.id,
+                "status": o.status or 'Pending', # Handle None status
+                "total_price": o.price,
+                "payment_method": "Cash", # Placeholder until DB column added
+                "date": o.order_date.strftime("%Y-%m-%d") if o.order_date else "N/A",
+                "items": [{"id": p.id, "name": p.name, "price": p.price} for p in o.products]
+            }
+            result.append(order_dict)
+        return jsonify(result)
+    return conditional_get(ORDER_LIST_TABLES, build)
 
 @main.route('/api/orders/<id>', methods=['PUT'])
 def update_order(id):
@@ -311,12 +588,65 @@ def update_order(id):
         order.update_status(data['status'])
         
     if 'courier_id' in data:
-        # Assign courier
-        order.courier_id = data['courier_id']
-        db.session.commit()
+        if data['courier_id'] is None:
+            # Unassign courier
+            previous_courier_id = order.courier_id
+            order.courier_id = None
+            db.session.commit()
+            order_events.publish_order(order, previous_courier_id=previous_courier_id)
+        else:
+            # Assign courier, unless another courier claimed the order first
+            courier = Courier.query.get(data['courier_id'])
+            if not courier:
+                return jsonify({"error": "Courier not found"}), 404
+            if not courier.choose_order(order):
+                return jsonify({"error": "Order already claimed"}), 409
         
     return jsonify({"id": order.id, "status": order.status})
 
+@main.route('/api/orders/<id>/claim', methods=['POST'])
+def claim_order(id):
+    data = request.get_json()
+    courier = Courier.query.get(data.get('courier_id'))
+    if not courier:
+        return jsonify({"error": "Courier not found"}), 404
+
+    order = Order.query.get(id)
+    if not order:
+        return jsonify({"error": "Order not found"}), 404
+
+    if not courier.choose_order(order):
+        return jsonify({"error": "Order already claimed"}), 409
+
+    return jsonify({"id": order.id, "status": order.status, "courier_id": order.courier_id})
+
+# --- Order event streams (Server-Sent Events, see events.py) ---
+# The stream doesn't touch the database, so the request's session and
+# connection are released before the first event is sent.
+def event_stream(channels):
+    if not order_events.enabled:
+        return jsonify({"error": "Order event streams are not enabled"}), 404
+    return Response(order_events.stream(channels), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@main.route('/api/customers/<cid>/events', methods=['GET'])
+def customer_events(cid):
+    if not Customer.query.get(cid):
+        return jsonify({"error": "Customer not found"}), 404
+    return event_stream([f"customer:{cid}"])
+
+@main.route('/api/couriers/<id>/events', methods=['GET'])
+def courier_events(id):
+    # Orders assigned to the courier, plus every order in their current area;
+    # clients reconnect after changing area
+    courier = Courier.query.get(id)
+    if not courier:
+        return jsonify({"error": "Courier not found"}), 404
+    channels = [f"courier:{id}"]
+    if courier.area:
+        channels.append(f"area:{courier.area}")
+    return event_stream(channels)
+
 @main.route('/api/orders', methods=['POST'])
 def create_order():
     data = request.get_json()
@@ -343,6 +673,9 @@ def create_order():
 @main.route('/api/admins', methods=['POST'])
 def create_admin():
     data = request.get_json()
+    error = sign_up_error(data)
+    if error:
+        return error
     new_admin = Admin(
         id=generate_id(),
         name=data['name'],
@@ -350,8 +683,24 @@ def create_admin():
         password=data['password'],
         status=data.get('status', 'Active')
     )
-    new_admin.sign_up()
-    return jsonify({**new_admin.to_dict(), "role": "admin"}), 201
+    return sign_up_response(new_admin, "admin")
+
+@main.route('/api/admin/slow-queries', methods=['GET', 'DELETE'])
+def slow_queries():
+    # ?admin_id= must name an admin; GET downloads the recorded statements,
+    # DELETE empties the log
+    if not Admin.query.get(request.args.get('admin_id', '')):
+        return jsonify({"error": "Admin access required"}), 403
+    if request.method == 'DELETE':
+        slow_query_log.clear()
+        return jsonify({"message": "Slow query log cleared"})
+    response = jsonify({
+        "enabled": slow_query_log.enabled,
+        "threshold_ms": slow_query_log.threshold * 1000,
+        "queries": slow_query_log.entries()
+    })
+    response.headers['Content-Disposition'] = 'attachment; filename="slow-queries.json"'
+    return response
 
 # --- Cart Routes ---
 @main.route('/api/customers/<customer_id>/cart', methods=['GET'])
@@ -373,50 +722,120 @@ def get_cart(customer_id):
         "products": [p.to_dict() for p in cart.products]
     })
 
+def find_cart(customer_id, create=False):
+    """Return (cart, error response) without loading the customer when the cart exists."""
+    cart = Cart.query.filter_by(customer_id=customer_id).first()
+    if cart:
+        return cart, None
+    if not Customer.query.get(customer_id):
+        return None, (jsonify({"error": "Customer not found"}), 404)
+    if not create:
+        return None, (jsonify({"error": "Cart not found"}), 404)
+    cart = Cart(id=generate_id(), customer_id=customer_id)
+    db.session.add(cart)
+    db.session.flush()
+    return cart, None
+
+def cart_mutation_response(message, cart, changed, changes_only):
+    # With "changes_only": true the client gets just the changed item and the new
+    # total; otherwise the item ids are read from the association table
+    body = {"message": message, "cart_price": cart.price}
+    if changes_only:
+        body["changed"] = changed
+    else:
+        body["products"] = cart.product_ids()
+    return jsonify(body)
+
 @main.route('/api/customers/<customer_id>/cart/add', methods=['POST'])
 def add_to_cart(customer_id):
-    customer = Customer.query.get(customer_id)
-    if not customer:
-        return jsonify({"error": "Customer not found"}), 404
-        
-    cart = customer.cart
-    if not cart:
-        cart = Cart(id=generate_id(), customer_id=customer_id)
-        db.session.add(cart)
-        db.session.commit()
-        
     data = request.get_json()
     product_id = data.get('product_id')
+    if not isinstance(product_id, str) or not product_id:
+        return jsonify({"error": "product_id must be a string"}), 400
     product = Product.query.get(product_id)
-    
     if not product:
         return jsonify({"error": "Product not found"}), 404
-        
-    cart.add_product(product)
+
+    cart, error = find_cart(customer_id, create=True)
+    if error:
+        return error
+
+    changed = {"id": product.id, "name": product.name, "price": product.price}
+    changed["added"] = cart.add_product(product)
     
-    return jsonify({
-        "message": "Product added to cart",
-        "cart_price": cart.price,
-        "products": [p.id for p in cart.products]
-    })
+    return cart_mutation_response("Product added to cart", cart, changed, data.get('changes_only'))
 
 @main.route('/api/customers/<customer_id>/cart/remove', methods=['POST'])
 def remove_from_cart(customer_id):
-    customer = Customer.query.get(customer_id)
-    if not customer:
-        return jsonify({"error": "Customer not found"}), 404
-        
-    cart = customer.cart
-    if not cart:
-        return jsonify({"error": "Cart not found"}), 404
-        
     data = request.get_json()
     product_id = data.get('product_id')
+    if not isinstance(product_id, str) or not product_id:
+        return jsonify({"error": "product_id must be a string"}), 400
+
+    cart, error = find_cart(customer_id)
+    if error:
+        return error
     
-    cart.remove_product(product_id)
+    changed = {"id": product_id, "removed": cart.remove_product(product_id)}
     
+    return cart_mutation_response("Product removed from cart", cart, changed, data.get('changes_only'))
+
+@main.route('/api/customers/<customer_id>/cart/batch', methods=['POST'])
+def batch_update_cart(customer_id):
+    # Body: {"items": [{"product_id": ..., "op": "add" | "remove"}, ...]}
+    # All products are resolved with one IN query and the changes are applied
+    # in a single transaction.
+    data = request.get_json()
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > MAX_CART_BATCH:
+        return jsonify({"error": f"At most {MAX_CART_BATCH} items per batch"}), 400
+
+    changes = []
+    for item in items:
+        op = item.get('op', 'add') if isinstance(item, dict) else None
+        if op not in ('add', 'remove') or not isinstance(item.get('product_id'), str) or not item['product_id']:
+            return jsonify({"error": f"Invalid item: {item}"}), 400
+        changes.append((op, item['product_id']))
+
+    cart, error = find_cart(customer_id, create=True)
+    if error:
+        return error
+
+    product_ids = {product_id for _, product_id in changes}
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(product_ids))}
+
+    # Adding an unknown product is reported per item rather than failing the batch
+    applicable = [(op, pid) for op, pid in changes if op == 'remove' or pid in products]
+    applied = iter(cart.apply_changes(applicable, products))
+
+    results = []
+    for op, product_id in changes:
+        result = {"product_id": product_id, "op": op}
+        if op == 'add' and product_id not in products:
+            result.update(applied=False, error="Product not found")
+        else:
+            result["applied"] = next(applied)
+        results.append(result)
+
+    return jsonify({"cart_price": cart.price, "results": results})
+
+@main.route('/api/customers/<customer_id>/cart/checkout', methods=['POST'])
+def checkout_cart(customer_id):
+    # Server-side checkout: the order is built from the cart as stored, so the
+    # client doesn't resend product ids and the cart can't change in between
+    cart, error = find_cart(customer_id)
+    if error:
+        return error
+
+    order = cart.checkout()
+    if not order:
+        return jsonify({"error": "Cart is empty"}), 400
+
     return jsonify({
-        "message": "Product removed from cart",
-        "cart_price": cart.price,
-        "products": [p.id for p in cart.products]
-    })
+        "id": order.id,
+        "price": order.price,
+        "total_weight": order.total_weight,
+        "status": order.status
+    }), 201
@@ -2,14 +2,19 @@
 Database Seeding Script
 Seeds the database with sample data from the frontend JavaScript
 This includes users, products, and orders.
+
+Usage: python seed_database.py [--scale 0] [--seed 1] [--chunk-size 10000]
+--scale N adds deterministic generated data (data_generator.py) on top.
 """
 
+import argparse
 from app import create_app
 from extensions import db
 from models import Customer, Admin, Courier, ServiceOfferor, Product, Order, Cart
+import data_generator
 
-def seed_database():
-    """Seed the database with sample data from frontend"""
+def seed_database(scale=0, seed=1, chunk_size=data_generator.DEFAULT_CHUNK_SIZE):
+    """Seed the database with sample data from frontend, plus generated data when scale > 0"""
     app = create_app()
     
     with app.app_context():
@@ -269,7 +274,9 @@ def seed_database():
             id="order-1001",
             price=120.0,
             status="preparing",
-            customer_id="customer-2"
+            customer_id="customer-2",
+            delivery_address="Downtown Cairo, Egypt",
+            delivery_area="Downtown Cairo"
         )
         db.session.add(order)
         
@@ -281,6 +288,7 @@ def seed_database():
         if margherita and cola:
             order.products.append(margherita)
             order.products.append(cola)
+        order.calculate_totals()
         
         db.session.commit()
         print(f"Created 1 sample order")
@@ -302,5 +310,20 @@ def seed_database():
         print(f"  Service Offeror: pizza@email.com / pizza123")
         print(f"  Courier: nour@email.com / nour123")
 
+        if scale > 0:
+            print()
+            report = data_generator.generate(scale=scale, seed=seed, chunk_size=chunk_size)
+            print("\nGenerated data:")
+            for line in report.lines():
+                print(line)
+            print(f"Generated users log in with password '{data_generator.PASSWORD}'")
+
 if __name__ == '__main__':
-    seed_database()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=0,
+                        help='add generated data at this scale (1 = about 200k rows); 0 seeds only the sample data')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the generated data')
+    parser.add_argument('--chunk-size', type=int, default=data_generator.DEFAULT_CHUNK_SIZE,
+                        help='rows per insert transaction')
+    args = parser.parse_args()
+    seed_database(scale=args.scale, seed=args.seed, chunk_size=max(1, args.chunk_size))
@@ -0,0 +1,44 @@
+"""
+Row Serializers
+Build API dicts straight from selected column tuples, so listings skip ORM
+instances and the per-attribute property accessors behind to_dict(). Each
+serializer produces the same keys and values as the model's to_dict().
+"""
+
+from extensions import db
+from models import Customer, Admin, Courier, ServiceOfferor, Product
+
+class RowSerializer:
+    def __init__(self, **fields):
+        # Output key -> column; the keys are also the labels of the selected columns
+        self.keys = tuple(fields)
+        self.columns = tuple(column.label(key) for key, column in fields.items())
+
+    def query(self, *extra_columns):
+        return db.session.query(*self.columns, *extra_columns)
+
+    def to_dict(self, row):
+        return dict(zip(self.keys, row))
+
+    def to_dicts(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+def user_fields(model, **fields):
+    return RowSerializer(id=model._User__id, name=model._User__name,
+                         email=model._User__email, **fields)
+
+USER_SERIALIZERS = {
+    'customer': user_fields(Customer, address=Customer._Customer__address,
+                            phone=Customer._Customer__phone),
+    'admin': user_fields(Admin, status=Admin.status),
+    'serviceOfferor': user_fields(ServiceOfferor, service_type=ServiceOfferor.service_type,
+                                  area=ServiceOfferor.area),
+    'courier': user_fields(Courier, status=Courier.status, salary=Courier._Courier__salary,
+                           area=Courier.area)
+}
+
+PRODUCT_SERIALIZER = RowSerializer(
+    id=Product.id, name=Product.name, details=Product.details, price=Product.price,
+    category=Product.category, status=Product.status, provider_id=Product.provider_id
+)
@@ -0,0 +1,103 @@
+"""
+Slow Query Log
+Opt-in recorder for SQL statements slower than a threshold. Each entry keeps
+the statement, the shape of its parameters (types only, never values, as
+they include passwords), the route that ran it and the database's query
+plan, in a bounded ring buffer that admins download from
+GET /api/admin/slow-queries.
+
+Durations cover cursor.execute(); rows SQLite produces lazily while they
+are fetched are not included.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from flask import has_request_context, request
+from sqlalchemy import event
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN '
+}
+# Plans are only asked for statements EXPLAIN can't execute or change
+EXPLAINABLE = ('SELECT', 'WITH')
+
+def parameter_shape(parameters):
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+class SlowQueryLog:
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 0.1
+        self.explain = True
+        self._entries = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SLOW_QUERY_ENABLED', False)
+        self.threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 100) / 1000
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self._entries = deque(maxlen=app.config.get('SLOW_QUERY_LOG_SIZE', 200))
+
+    def instrument_engine(self, engine):
+        if not self.enabled:
+            return
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info['slow_query_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['slow_query_started']
+            if elapsed >= self.threshold:
+                self.record(conn, statement, parameters, executemany, elapsed)
+
+    def record(self, conn, statement, parameters, executemany, elapsed):
+        if executemany:
+            shape = {"rows": len(parameters), "each": parameter_shape(parameters[0]) if parameters else None}
+        else:
+            shape = parameter_shape(parameters)
+        entry = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "duration_ms": round(elapsed * 1000, 2),
+            "statement": statement,
+            "parameters": shape,
+            "route": f"{request.method} {request.path} ({request.endpoint})" if has_request_context() else None,
+            "plan": None
+        }
+        if self.explain and not executemany:
+            entry["plan"] = self.query_plan(conn, statement, parameters)
+        with self._lock:
+            self._entries.append(entry)
+
+    def query_plan(self, conn, statement, parameters):
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if not prefix or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        # A separate DBAPI cursor, so the rows of the slow statement itself
+        # are still there for SQLAlchemy to fetch
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            cursor.close()
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
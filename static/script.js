@@ -6,6 +6,9 @@ const API_BASE_URL = '/api';
 let currentUser = null; // Will store the logged-in user object from API
 let selectedProductId = null; // Checks which product is being edited
 let currentCategoryFilter = 'all'; // Current filter for products
+let orderEvents = null; // EventSource pushing order changes to the dashboard
+let orderPollTimer = null; // Interval refreshing the orders when events are off
+const ORDER_POLL_INTERVAL_MS = 15000;
 
 /* ==================== SECTION 1: INITIALIZATION ====================
    Code that runs when the page loads.
@@ -114,6 +117,7 @@ async function handleSignup(event) {
  * Clears current user and returns to login.
  */
 function logout() {
+    stopOrderUpdates();
     currentUser = null;
     document.getElementById('mainApp').classList.add('hidden');
     document.getElementById('loginPage').classList.remove('hidden');
@@ -149,6 +153,7 @@ function redirectToRolePage() {
         displayProducts();
         displayCart();
         displayCustomerOrders();
+        watchOrders(`${API_BASE_URL}/customers/${currentUser.id}/events`, displayCustomerOrders);
     }
     else if (currentUser.role === 'admin') {
         document.getElementById('adminSection').classList.remove('hidden');
@@ -167,6 +172,40 @@ function redirectToRolePage() {
         document.getElementById('deliveryArea').value = currentUser.area || '';
         document.getElementById('currentArea').textContent = currentUser.area || 'Not set';
         displayCourierOrders();
+        watchOrders(`${API_BASE_URL}/couriers/${currentUser.id}/events`, displayCourierOrders);
+    }
+}
+
+/**
+ * watchOrders(eventsUrl, onChange)
+ * Calls onChange whenever the user's orders may have changed. By default the
+ * order list is polled (unchanged listings cost the server a 304); when the
+ * server streams order events (data-order-updates="stream" on <body>), a
+ * Server-Sent Events stream from eventsUrl triggers the reloads instead.
+ * EventSource reconnects by itself when the server ends the stream.
+ */
+function watchOrders(eventsUrl, onChange) {
+    stopOrderUpdates();
+    if (document.body.dataset.orderUpdates === 'stream' && window.EventSource) {
+        orderEvents = new EventSource(eventsUrl);
+        orderEvents.addEventListener('order', () => onChange());
+        // Sent when events were dropped for a slow connection: reload everything
+        orderEvents.addEventListener('resync', () => onChange());
+        return;
+    }
+    orderPollTimer = setInterval(() => {
+        if (!document.hidden) onChange();
+    }, ORDER_POLL_INTERVAL_MS);
+}
+
+function stopOrderUpdates() {
+    if (orderEvents) {
+        orderEvents.close();
+        orderEvents = null;
+    }
+    if (orderPollTimer) {
+        clearInterval(orderPollTimer);
+        orderPollTimer = null;
     }
 }
 
@@ -182,16 +221,14 @@ async function displayProducts() {
     container.innerHTML = '<p>Loading products...</p>';
 
     try {
-        const response = await fetch(`${API_BASE_URL}/products`);
-        if (!response.ok) throw new Error('Failed to fetch products');
+        // Status and category filters are applied by the backend
+        const params = new URLSearchParams({ status: 'approved' });
+        if (currentCategoryFilter !== 'all') params.set('category', currentCategoryFilter);
 
-        const products = await response.json();
-        const approvedProducts = products.filter(p => p.status === 'approved');
+        const response = await fetch(`${API_BASE_URL}/products?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch products');
 
-        // Apply Category Filter
-        const filtered = currentCategoryFilter === 'all'
-            ? approvedProducts
-            : approvedProducts.filter(p => p.category === currentCategoryFilter);
+        const filtered = await response.json();
 
         container.innerHTML = '';
 
@@ -244,7 +281,7 @@ async function addToCart(productId) {
         const response = await fetch(`${API_BASE_URL}/customers/${currentUser.id}/cart/add`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ product_id: productId })
+            body: JSON.stringify({ product_id: productId, changes_only: true })
         });
 
         if (!response.ok) throw new Error('Failed to add to cart');
@@ -257,6 +294,29 @@ async function addToCart(productId) {
     }
 }
 
+/**
+ * reorder(productIds)
+ * Puts every product of a previous order back in the cart with one
+ * POST /api/customers/{id}/cart/batch request
+ */
+async function reorder(productIds) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/customers/${currentUser.id}/cart/batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ items: productIds.map(id => ({ product_id: id, op: 'add' })) })
+        });
+
+        if (!response.ok) throw new Error('Failed to reorder');
+
+        showToast('Order items added to cart!', 'success');
+        displayCart();
+
+    } catch (error) {
+        showToast(error.message, 'error');
+    }
+}
+
 /**
  * displayCart()
  * Fetches cart from /api/customers/{id}/cart
@@ -311,7 +371,7 @@ async function displayCart() {
             cartItemsDiv.appendChild(div);
         });
 
-        cartTotalSpan.textContent = `${cart.total_price} EGP`;
+        cartTotalSpan.textContent = `${cart.price} EGP`;
 
     } catch (error) {
         console.error('Cart error:', error);
@@ -327,7 +387,7 @@ async function removeFromCart(productId) {
         const response = await fetch(`${API_BASE_URL}/customers/${currentUser.id}/cart/remove`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ product_id: productId })
+            body: JSON.stringify({ product_id: productId, changes_only: true })
         });
 
         if (!response.ok) throw new Error('Failed to remove item');
@@ -367,36 +427,25 @@ function togglePaymentForm() {
 
 /**
  * processPayment()
- * Creates order via POST /api/orders
+ * Turns the server-side cart into an order via POST /api/customers/{id}/cart/checkout
  */
 async function processPayment() {
     const paymentMethod = document.querySelector('input[name="paymentMethod"]:checked').value;
 
-    // We need product IDs to create order. Fetch cart first.
     try {
-        const cartRes = await fetch(`${API_BASE_URL}/customers/${currentUser.id}/cart`);
-        const cartData = await cartRes.json();
-
-        if (!cartData.products || cartData.products.length === 0) return;
-
-        const productIds = cartData.products.map(p => p.id);
-
-        const response = await fetch(`${API_BASE_URL}/orders`, {
+        const response = await fetch(`${API_BASE_URL}/customers/${currentUser.id}/cart/checkout`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                customer_id: currentUser.id,
-                product_ids: productIds,
-                payment_method: paymentMethod
-            })
+            body: JSON.stringify({ payment_method: paymentMethod })
         });
 
+        if (response.status === 400) return; // Cart is empty
         if (!response.ok) throw new Error('Order creation failed');
 
         // Success
         closeCheckout();
         showPaymentSuccess();
-        displayCart(); // Should be empty now if backend clears it, otherwise we might see issue
+        displayCart(); // The backend emptied the cart
         displayCustomerOrders();
 
     } catch (error) {
@@ -437,13 +486,16 @@ async function displayCustomerOrders() {
             div.className = 'order-card';
             div.innerHTML = `
                 <div class="order-header">
-                    <strong>Order #${order.id.substring(0, 8)}</strong>
+                    <strong>Order #${order.id.slice(-8)}</strong>
                     <span class="status-badge status-${order.status}">${formatStatusName(order.status)}</span>
                 </div>
                 <div class="order-details">
                     <p>Total: ${order.total_price} EGP</p>
                     <p>Method: ${order.payment_method}</p>
                 </div>
+                <div class="actions">
+                    <button onclick='reorder(${JSON.stringify(order.items.map(i => i.id))})' class="btn-xs btn-secondary">Reorder</button>
+                </div>
             `;
             container.appendChild(div);
         });
@@ -513,7 +565,8 @@ async function displayUsersTable() {
     container.innerHTML = '<p>Loading users...</p>';
 
     try {
-        const response = await fetch(`${API_BASE_URL}/users`);
+        // Streamed by the backend so large user bases don't have to be buffered server-side
+        const response = await fetch(`${API_BASE_URL}/users?stream=1`);
         const users = await response.json();
 
         let html = `
@@ -558,15 +611,14 @@ function editUser(userId) {
 
 /**
  * displayPendingProducts()
- * Fetch all products, filter by p.status === 'pending'
+ * Fetch products with status 'pending'
  */
 async function displayPendingProducts() {
     const container = document.getElementById('pendingProductsList');
 
     try {
-        const response = await fetch(`${API_BASE_URL}/products`);
-        const products = await response.json();
-        const pending = products.filter(p => p.status === 'pending');
+        const response = await fetch(`${API_BASE_URL}/products?status=pending`);
+        const pending = await response.json();
 
         container.innerHTML = '';
         if (pending.length === 0) {
@@ -665,9 +717,8 @@ async function addProduct(event) {
         // We'll fetch providers and pick the first one as a fallback?
 
         // Fetch a provider first
-        const provRes = await fetch(`${API_BASE_URL}/users`);
-        const users = await provRes.json();
-        const provider = users.find(u => u.role === 'serviceOfferor');
+        const provRes = await fetch(`${API_BASE_URL}/users?role=serviceOfferor&limit=1`);
+        const [provider] = await provRes.json();
 
         if (!provider) throw new Error('No Service Provider available to assign product to.');
 
@@ -749,10 +800,9 @@ async function displayServiceProducts() {
     const container = document.getElementById('serviceProductsList');
 
     try {
-        const response = await fetch(`${API_BASE_URL}/products`);
-        const products = await response.json();
-        // Filter by current user (provider)
-        const myProducts = products.filter(p => p.provider_id === currentUser.id);
+        // Only fetch the current provider's products
+        const response = await fetch(`${API_BASE_URL}/products?provider_id=${encodeURIComponent(currentUser.id)}`);
+        const myProducts = await response.json();
 
         container.innerHTML = '';
         if (myProducts.length === 0) {
@@ -865,6 +915,9 @@ async function updateDeliveryArea() {
 
         document.getElementById('currentArea').textContent = area;
         showToast('Delivery area updated', 'success');
+        // An event stream follows the area the courier had when it connected
+        watchOrders(`${API_BASE_URL}/couriers/${currentUser.id}/events`, displayCourierOrders);
+        displayCourierOrders();
 
     } catch (e) { showToast(e.message, 'error'); }
 }
@@ -873,14 +926,13 @@ async function displayCourierOrders() {
     const container = document.getElementById('courierOrders');
 
     try {
-        // Fetch all orders for now (Simplified)
-        // In real app, we filter by area or assignment
-        const response = await fetch(`${API_BASE_URL}/orders`);
-        const orders = await response.json();
-        /* Filter: show orders that are 'placed' or 'on-the-way'? 
-           Let's show all pending orders 
-        */
-        const activeOrders = orders.filter(o => o.status !== 'delivered' && o.status !== 'cancelled');
+        // The backend returns only this courier's open orders and the
+        // unassigned ones in their delivery area
+        const feedUrl = scope => `${API_BASE_URL}/couriers/${currentUser.id}/orders?scope=${scope}`;
+        const [mine, available] = await Promise.all(
+            ['mine', 'available'].map(scope => fetch(feedUrl(scope)).then(res => res.json()))
+        );
+        const activeOrders = [...mine, ...available];
 
         container.innerHTML = '';
         if (activeOrders.length === 0) {
@@ -893,16 +945,18 @@ async function displayCourierOrders() {
             div.className = 'order-card';
             div.innerHTML = `
                 <div class="order-header">
-                    <strong>Order #${o.id.substring(0, 8)}</strong>
+                    <strong>Order #${o.id.slice(-8)}</strong>
                     <span class="status-badge status-${o.status}">${o.status}</span>
                 </div>
                 <div class="order-details">
-                    <p>Total: ${o.total_price} EGP</p>
-                    <p>Customer ID: ${o.customer_id.substring(0, 5)}...</p>
+                    <p>Total: ${o.totalPrice} EGP</p>
+                    <p>Customer ID: ${o.customerId.substring(0, 5)}...</p>
                 </div>
                 <div class="actions">
-                    <button onclick="updateOrderStatus('${o.id}', 'on-the-way')" class="btn-xs btn-primary">Pickup</button>
-                    <button onclick="updateOrderStatus('${o.id}', 'delivered')" class="btn-xs btn-success">Deliver</button>
+                    ${o.assignedCourier
+                        ? `<button onclick="updateOrderStatus('${o.id}', 'on-the-way')" class="btn-xs btn-primary">Pickup</button>
+                           <button onclick="updateOrderStatus('${o.id}', 'delivered')" class="btn-xs btn-success">Deliver</button>`
+                        : `<button onclick="claimOrder('${o.id}')" class="btn-xs btn-primary">Claim</button>`}
                 </div>
             `;
             container.appendChild(div);
@@ -911,6 +965,26 @@ async function displayCourierOrders() {
     } catch (e) { console.error(e); }
 }
 
+/**
+ * claimOrder(orderId)
+ * Calls POST /api/orders/{id}/claim; 409 means another courier was faster
+ */
+async function claimOrder(orderId) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/orders/${orderId}/claim`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ courier_id: currentUser.id })
+        });
+        if (response.status === 409) throw new Error('Order was already claimed by another courier');
+        if (!response.ok) throw new Error('Claim failed');
+
+        showToast('Order claimed', 'success');
+
+    } catch (e) { showToast(e.message, 'error'); }
+    displayCourierOrders();
+}
+
 async function updateOrderStatus(orderId, status) {
     try {
         const response = await fetch(`${API_BASE_URL}/orders/${orderId}`, {
@@ -4,6 +4,7 @@ import subprocess
 import time
 import os
 import json
+from contextlib import contextmanager
 
 # Configuration
 BASE_URL = "http://127.0.0.1:5000/api"
@@ -16,6 +17,35 @@ def print_fail(msg):
     print(f"[FAIL] {msg}")
     sys.exit(1)
 
+@contextmanager
+def count_queries(engine):
+    """Count the SQL statements executed on engine inside the block."""
+    from sqlalchemy import event
+
+    counter = {"count": 0}
+    def _count(*args):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+def assert_max_queries(app, path, max_queries):
+    """GET path in-process and fail if it runs more than max_queries statements."""
+    from extensions import db
+
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as counter:
+        res = client.get(path)
+    if res.status_code != 200: print_fail(f"GET {path} failed: {res.status_code}")
+    if counter["count"] > max_queries:
+        print_fail(f"GET {path} ran {counter['count']} queries (budget {max_queries})")
+    print_pass(f"GET {path} ran {counter['count']} queries (budget {max_queries})")
+
 def run_workflow():
     # 1. Start Flask Server in background
     print("Starting Flask Server...")
@@ -43,7 +73,7 @@ def run_workflow():
         
         # DEBUG: Check if user exists
         print("DEBUG: Fetching all users...")
-        res = session.get(f"{BASE_URL}/users")
+        res = session.get(f"{BASE_URL}/users", params={"role": "customer", "q": unique_email})
         if res.status_code == 200:
             users_list = res.json()
             found = any(u['email'] == unique_email for u in users_list)
@@ -125,18 +155,23 @@ def run_workflow():
         if len(cart_data['products']) == 0: print_fail("Cart is empty")
         print_pass("Cart Verified")
 
-        # Checkout (Create Order)
+        # Checkout (Create Order from the server-side cart)
         print("Checking Out...")
-        order_data = {
-            "customer_id": customer_id,
-            "product_ids": [product_id],
-            "payment_method": "cash"
-        }
-        res = session.post(f"{BASE_URL}/orders", json=order_data)
+        res = session.post(f"{BASE_URL}/customers/{customer_id}/cart/checkout", json={"payment_method": "cash"})
         if res.status_code != 201: print_fail(f"Checkout failed: {res.text}")
         order_id = res.json()['id']
+        if res.json()['price'] != product_data['price']: print_fail("Wrong order price")
         print_pass(f"Order Created: #{order_id}")
 
+        res = session.get(f"{BASE_URL}/customers/{customer_id}/cart")
+        if res.json()['products'] or res.json()['price'] != 0: print_fail("Cart not emptied by checkout")
+        print_pass("Cart Emptied")
+
+        # Direct order creation from product ids
+        res = session.post(f"{BASE_URL}/orders", json={"customer_id": customer_id, "product_ids": [product_id]})
+        if res.status_code != 201: print_fail(f"Order creation failed: {res.text}")
+        print_pass("Order Created from product ids")
+
         # Verify Order History (GET /orders)
         print("Verifying Order History...")
         res = session.get(f"{BASE_URL}/customers/{customer_id}/orders")
@@ -170,6 +205,43 @@ def run_workflow():
         print_pass("Order Status Updated to 'on-the-way'")
 
 
+        print("\n--- 6. QUERY BUDGETS ---")
+
+        # Listings must cost a fixed number of queries however many rows they return
+        # (each includes one lookup of the table versions behind its ETag)
+        from app import create_app
+        app = create_app()
+        assert_max_queries(app, "/api/products", 2)
+        assert_max_queries(app, "/api/orders", 3)
+        assert_max_queries(app, f"/api/customers/{customer_id}/orders", 4)
+
+
+        print("\n--- 7. CONDITIONAL GET ---")
+
+        client = app.test_client()
+        for path in ["/api/products", "/api/orders", "/api/providers", f"/api/customers/{customer_id}/orders"]:
+            res = client.get(path)
+            etag = res.headers.get("ETag")
+            if not etag: print_fail(f"GET {path} has no ETag")
+            res = client.get(path, headers={"If-None-Match": etag})
+            if res.status_code != 304: print_fail(f"GET {path} with a matching ETag returned {res.status_code}")
+            print_pass(f"GET {path} answered 304 for an unchanged ETag")
+
+        etag = client.get("/api/products").headers["ETag"]
+        session.put(f"{BASE_URL}/products/{product_id}", json={"price": 51.0})
+        res = client.get("/api/products", headers={"If-None-Match": etag})
+        if res.status_code != 200 or res.headers.get("ETag") == etag:
+            print_fail("Product update did not change the catalog ETag")
+        print_pass("Product update changed the catalog ETag")
+
+        etag = client.get("/api/products").headers["ETag"]
+        res = session.post(f"{BASE_URL}/orders", json={"customer_id": customer_id, "product_ids": [product_id]})
+        if res.status_code != 201: print_fail(f"Order creation failed: {res.text}")
+        res = client.get("/api/products", headers={"If-None-Match": etag})
+        if res.status_code != 304: print_fail(f"Placing an order changed the catalog ETag ({res.status_code})")
+        print_pass("Placing an order kept the catalog ETag")
+
+
         print("\nALL WORKFLOW TESTS PASSED SUCCESSFULLY!")
         print("The Frontend and Backend are correctly integrated via these API contracts.")
 